@@ -0,0 +1,337 @@
+# pipeline_bench.py
+# --------------------------------
+# Headless per-stage benchmark of the capture pipeline
+# (the stages AlignmentPage.update_frame runs), without PyQt or a camera.
+#
+#   python -m benchmarks.pipeline_bench
+#   python -m benchmarks.pipeline_bench --frames 600 --clip data/videos/x.avi
+#   python -m benchmarks.pipeline_bench --compare benchmarks/results/<old>.json
+#   python -m benchmarks.pipeline_bench --y16     # raw radiometric frames
+#
+# Results are saved as JSON so successive runs can be compared.
+# --------------------------------
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import datetime
+import tempfile
+
+import cv2
+import numpy as np
+
+from core.alignment_logic import AlignmentLogic
+from core.thermal_processor import ThermalProcessor
+from core.data_logger import DataLogger
+from core.gan_validator import GANValidator
+from core.feature_accumulator import OnlineFeatureAccumulator
+from ml_stage.features import extract_features
+from core.radiometric import RadiometricConverter, SyntheticY16Source
+from core.video_recorder import open_capture
+
+
+# -------- CONFIGURATION --------
+RESULTS_DIR = "benchmarks/results"
+FRAME_SIZE = (256, 192)             # (width, height), as CameraManager requests
+NUM_LANDMARKS = 69
+REGRESSION_THRESHOLD = 0.10         # flag p50 slowdowns above 10%...
+REGRESSION_MIN_MS = 0.1             # ...that are also at least this many ms
+# --------------------------------
+
+
+class SyntheticFrameSource:
+    """
+    Deterministic face-like frames: a bright ellipse drifting over a
+    gradient with fixed-seed noise, plus its ground-truth landmarks.
+    """
+    def __init__(self, num_frames, size=FRAME_SIZE, seed=0):
+        self.num_frames = num_frames
+        self.w, self.h = size
+        self.rng = np.random.default_rng(seed)
+        self.background = np.tile(np.linspace(20, 80, self.w, dtype=np.float32), (self.h, 1))
+        angles = np.linspace(0, 2 * np.pi, NUM_LANDMARKS, endpoint=False)
+        self.unit_points = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+
+    def __iter__(self):
+        for i in range(self.num_frames):
+            cx = self.w / 2 + 20 * np.sin(i / 30)
+            cy = self.h / 2 + 10 * np.cos(i / 45)
+            gray = self.background.copy()
+            cv2.ellipse(gray, (int(cx), int(cy)), (self.w // 6, self.h // 4), 0, 0, 360, 200, -1)
+            gray += self.rng.normal(0, 4, gray.shape).astype(np.float32)
+            frame = cv2.cvtColor(np.clip(gray, 0, 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+            landmarks = (self.unit_points * (self.w / 8, self.h / 6) + (cx, cy)).astype(int)
+            yield frame, landmarks
+
+
+class ClipFrameSource:
+    """Frames from a recorded clip; landmarks come from the detector (or a fixed layout)."""
+    def __init__(self, path, num_frames):
+        self.path = path
+        self.num_frames = num_frames
+
+    def __iter__(self):
+        cap = open_capture(self.path)
+        fallback = None
+        for _ in range(self.num_frames):
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if fallback is None:
+                h, w = frame.shape[:2]
+                fallback = next(iter(SyntheticFrameSource(1, (w, h))))[1]
+            yield frame, fallback
+        cap.release()
+
+
+class Y16FrameSource:
+    """Raw 16-bit radiometric frames (radiometric.SyntheticY16Source, unpaced)."""
+    def __init__(self, num_frames, size=FRAME_SIZE, seed=0):
+        self.num_frames = num_frames
+        self.camera = SyntheticY16Source(*size, seed=seed, realtime=False)
+        self.landmarks = SyntheticFrameSource(num_frames, size, seed)
+
+    def __iter__(self):
+        for (_, landmarks) in self.landmarks:
+            _, raw = self.camera.read()
+            yield raw, landmarks
+
+
+def summarize(samples):
+    ms = np.asarray(samples) * 1000
+    if ms.size == 0:
+        return None
+    return {
+        "count": int(ms.size),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def load_detector(use_detector):
+    if not use_detector:
+        return None, "disabled"
+    try:
+        from core.landmark_detector import LandmarkDetector
+        return LandmarkDetector(), "mediapipe"
+    except Exception as e:   # mediapipe or the model file missing on this box
+        return None, f"unavailable ({e.__class__.__name__}: {e})"
+
+
+def run_pipeline(source, use_detector=True, async_logger=False):
+    # Session files and the calibration only live for the run
+    with tempfile.TemporaryDirectory(prefix="pipeline_bench_") as tmp_dir:
+        return _run_pipeline(source, tmp_dir, use_detector, async_logger)
+
+
+def _run_pipeline(source, tmp_dir, use_detector, async_logger):
+    detector, detector_status = load_detector(use_detector)
+
+    aligner = AlignmentLogic(calibration_path=os.path.join(tmp_dir, "alignment.npz"))
+    aligner.set_calibration([[10, 10], [200, 20], [50, 150]], [[12, 8], [205, 25], [48, 155]])
+    validator = GANValidator(backend="colormap", threaded=False, sample_every=1)
+    processor = ThermalProcessor()
+    logger = DataLogger(output_dir=tmp_dir, async_mode=async_logger, session_format="both")
+    accumulator = OnlineFeatureAccumulator()
+
+    stages = {name: [] for name in ("detect", "align", "gan", "thermal", "log", "accumulate")}
+    radiometric = None
+    end_to_end = []
+    misses = 0
+
+    run_start = time.perf_counter()
+    for frame_idx, (frame, synthetic_landmarks) in enumerate(source, start=1):
+        frame_start = time.perf_counter()
+
+        thermal_frame = frame
+        if frame.dtype == np.uint16:
+            # Raw Y16: °C for the stimulus data, 8-bit preview for detection
+            if radiometric is None:
+                radiometric = RadiometricConverter()
+                stages["radiometric"] = []
+            t = time.perf_counter()
+            thermal_frame = radiometric.to_celsius(frame)
+            frame = radiometric.preview(frame)
+            stages["radiometric"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        landmarks = detector.get_landmarks(frame) if detector else synthetic_landmarks
+        stages["detect"].append(time.perf_counter() - t)
+        if landmarks is None:
+            misses += 1
+            landmarks = synthetic_landmarks
+
+        t = time.perf_counter()
+        thermal_landmarks = aligner.map_points(landmarks)
+        stages["align"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        validator.validate_alignment(validator.generate_synthetic_thermal(frame), thermal_landmarks)
+        stages["gan"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        stim_data = processor.extract_stimulus_data(thermal_frame, thermal_landmarks)
+        stages["thermal"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        now = datetime.datetime.now()
+        logger.log_frame(frame_idx, thermal_landmarks, stim_data, timestamp=now)
+        stages["log"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        accumulator.add(now.timestamp(), stim_data)
+        stages["accumulate"].append(time.perf_counter() - t)
+
+        end_to_end.append(time.perf_counter() - frame_start)
+
+    t = time.perf_counter()
+    logger.close()
+    close_time = time.perf_counter() - t
+    elapsed = time.perf_counter() - run_start
+
+    t = time.perf_counter()
+    extract_features(logger.file_path)
+    features_csv = time.perf_counter() - t
+    t = time.perf_counter()
+    extract_features(logger.binary_path)
+    features_binary = time.perf_counter() - t
+
+    return {
+        "frames": len(end_to_end),
+        "detector": detector_status,
+        "detection_misses": misses,
+        "async_logger": async_logger,
+        "throughput_fps": len(end_to_end) / elapsed if elapsed > 0 else 0.0,
+        "stages": {name: summarize(samples) for name, samples in stages.items()},
+        "end_to_end": summarize(end_to_end),
+        "one_shot": {
+            "logger_close_ms": close_time * 1000,
+            "features_csv_ms": features_csv * 1000,
+            "features_binary_ms": features_binary * 1000,
+        },
+    }
+
+
+def environment():
+    return {
+        "timestamp": datetime.datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def print_report(report):
+    print(f"\nFrames: {report['frames']}  detector: {report['detector']}  "
+          f"misses: {report['detection_misses']}  async logger: {report['async_logger']}")
+    print(f"{'stage':<12} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms)")
+    rows = list(report["stages"].items()) + [("end_to_end", report["end_to_end"])]
+    for name, s in rows:
+        if s is None:
+            continue
+        print(f"{name:<12} {s['mean_ms']:>8.3f} {s['p50_ms']:>8.3f} {s['p95_ms']:>8.3f} "
+              f"{s['p99_ms']:>8.3f} {s['max_ms']:>8.3f}")
+    print(f"Throughput: {report['throughput_fps']:.1f} fps")
+    for name, value in report["one_shot"].items():
+        print(f"{name}: {value:.2f}")
+
+
+def compare(report, previous_path, threshold=REGRESSION_THRESHOLD, min_ms=REGRESSION_MIN_MS):
+    """
+    Prints p50 deltas against an earlier run; returns the regressed stages.
+    A stage regresses when its p50 grew by more than `threshold` (relative)
+    and by at least `min_ms`, so sub-0.1 ms stages don't flag on jitter.
+    Raises ValueError when the runs used a different setup (detector,
+    frame source, frame count, logger mode).
+    """
+    with open(previous_path) as f:
+        previous = json.load(f)["results"]
+    setup, old_setup = report.get("setup", {}), previous.get("setup")
+    if old_setup is None:
+        print(f"\nWarning: {previous_path} does not record its setup; it may not be comparable")
+    else:
+        mismatched = {key for key in set(setup) | set(old_setup) if setup.get(key) != old_setup.get(key)}
+        if mismatched:
+            raise ValueError(f"{previous_path} used a different setup: " + ", ".join(
+                f"{key} {old_setup.get(key)!r} -> {setup.get(key)!r}" for key in sorted(mismatched)))
+    # Without MediaPipe the detect stage times a no-op
+    timed_detector = setup.get("detector") == "mediapipe"
+
+    regressions = []
+    print(f"\nCompared with {previous_path}:")
+    rows = list(report["stages"].items()) + [("end_to_end", report["end_to_end"])]
+    for name, s in rows:
+        old = previous["stages"].get(name) if name != "end_to_end" else previous.get("end_to_end")
+        if s is None or not old or (name == "detect" and not timed_detector):
+            continue
+        diff_ms = s["p50_ms"] - old["p50_ms"]
+        delta = diff_ms / old["p50_ms"] if old["p50_ms"] else 0.0
+        flag = "  REGRESSION" if delta > threshold and diff_ms >= min_ms else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<12} p50 {old['p50_ms']:.3f} -> {s['p50_ms']:.3f} ms ({delta:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless per-stage pipeline benchmark")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--clip", help="recorded video to use instead of synthetic frames")
+    parser.add_argument("--no-detector", action="store_true", help="use synthetic landmarks only")
+    parser.add_argument("--async-logger", action="store_true")
+    parser.add_argument("--y16", action="store_true", help="synthetic raw 16-bit radiometric frames")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    if args.clip:
+        source = ClipFrameSource(args.clip, args.frames)
+    elif args.y16:
+        source = Y16FrameSource(args.frames, seed=args.seed)
+    else:
+        source = SyntheticFrameSource(args.frames, seed=args.seed)
+    report = run_pipeline(source, use_detector=not args.no_detector, async_logger=args.async_logger)
+    # What has to match for compare() to be meaningful
+    report["setup"] = {
+        "detector": report["detector"].split()[0],
+        "y16": args.y16,
+        "clip": args.clip,
+        "frames": report["frames"],
+        "async_logger": args.async_logger,
+    }
+    print_report(report)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"pipeline_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "environment": environment(),
+            "config": vars(args),
+            "results": report,
+        }, f, indent=2)
+    print("Saved to", output)
+
+    if args.compare:
+        try:
+            regressions = compare(report, args.compare)
+        except ValueError as e:
+            print(f"\nNot compared: {e}")
+            sys.exit(2)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
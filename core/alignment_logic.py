@@ -1,20 +1,142 @@
+import os
 import cv2
 import numpy as np
 
 class AlignmentLogic: # The class is defined here, so you don't import it.
-    def __init__(self):
-        self.matrix = None
+    def __init__(self, calibration_path="data/calibration/alignment.npz",
+                 rgb_size=(256, 192), thermal_size=(256, 192)):
+        """
+        calibration_path: where the calibration and its remap tables are cached
+        rgb_size, thermal_size: (width, height) of each domain's frames
+        """
+        self.matrix = None          # 2x3 affine or 3x3 homography, RGB -> thermal
+        self.kind = None            # "affine" | "homography"
+        self.calibration_path = calibration_path
+        self.rgb_size = tuple(rgb_size)
+        self.thermal_size = tuple(thermal_size)
 
-    def set_calibration(self, rgb_pts, thermal_pts):
-        self.matrix = cv2.getAffineTransform(
-            np.float32(rgb_pts), 
-            np.float32(thermal_pts)
-        )
+        # cv2.remap tables (fixed-point) for warping whole frames
+        self.to_thermal_maps = None
+        self.to_rgb_maps = None
+
+        # Reused work buffers for map_points, keyed by input shape
+        self._buffers = {}
+
+        self.load()
+
+    def set_calibration(self, rgb_pts, thermal_pts, kind=None):
+        """
+        3 point pairs -> exact affine; 4+ -> homography (or a least-squares
+        affine with kind="affine").
+        """
+        rgb_pts = np.float32(rgb_pts)
+        thermal_pts = np.float32(thermal_pts)
+        if kind is None:
+            kind = "affine" if len(rgb_pts) == 3 else "homography"
+
+        if kind == "affine" and len(rgb_pts) == 3:
+            matrix = cv2.getAffineTransform(rgb_pts, thermal_pts)
+        elif kind == "affine":
+            matrix, _ = cv2.estimateAffine2D(rgb_pts, thermal_pts)
+        else:
+            matrix, _ = cv2.findHomography(rgb_pts, thermal_pts)
+        if matrix is None:
+            raise ValueError("Calibration points are degenerate")
+
+        self.matrix = matrix
+        self.kind = kind
+        self._build_maps()
+        self.save()
+
+    def _full_matrix(self):
+        if self.kind == "homography":
+            return self.matrix
+        return np.vstack([self.matrix, [0.0, 0.0, 1.0]])
+
+    def _build_maps(self):
+        """Precomputes remap tables in both directions for the current matrix."""
+        M = self._full_matrix()
+        self.to_thermal_maps = self._remap_tables(np.linalg.inv(M), self.thermal_size)
+        self.to_rgb_maps = self._remap_tables(M, self.rgb_size)
+
+    def _remap_tables(self, dst_to_src, dst_size):
+        # For every destination pixel, where to sample in the source frame
+        w, h = dst_size
+        xs, ys = np.meshgrid(np.arange(w, dtype=np.float64), np.arange(h, dtype=np.float64))
+        src = dst_to_src @ np.stack([xs.ravel(), ys.ravel(), np.ones(w * h)])
+        map_x = (src[0] / src[2]).reshape(h, w).astype(np.float32)
+        map_y = (src[1] / src[2]).reshape(h, w).astype(np.float32)
+        return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
 
-    def map_points(self, points):
+    def map_points(self, points, out=None):
+        """
+        points: (N, 2) or (frames, N, 2) RGB-domain points
+        out: optional int array of the same shape to write into
+        Returns thermal-domain points as ints.
+        """
         if self.matrix is None:
             return points
-        ones = np.ones(shape=(len(points), 1))
-        points_ones = np.hstack([points, ones])
-        transformed_pts = self.matrix.dot(points_ones.T).T
-        return transformed_pts.astype(int)
\ No newline at end of file
+        points = np.asarray(points)
+
+        buf = self._buffers.get(points.shape)
+        if buf is None:
+            buf = self._buffers[points.shape] = (
+                np.empty(points.shape, dtype=np.float64),
+                np.empty(points.shape[:-1] + (1,), dtype=np.float64),
+            )
+        mapped, w = buf
+
+        A = self.matrix[:2, :2]
+        np.matmul(points, A.T, out=mapped)
+        mapped += self.matrix[:2, 2]
+        if self.kind == "homography":
+            np.matmul(points, self.matrix[2, :2, None], out=w)
+            w += self.matrix[2, 2]
+            mapped /= w
+
+        if out is None:
+            return mapped.astype(int)
+        np.copyto(out, mapped, casting="unsafe")
+        return out
+
+    def warp_to_thermal(self, rgb_frame):
+        """Resamples a full RGB-domain frame into the thermal domain."""
+        if self.to_thermal_maps is None:
+            return rgb_frame
+        return cv2.remap(rgb_frame, *self.to_thermal_maps, cv2.INTER_LINEAR)
+
+    def warp_to_rgb(self, thermal_frame):
+        """Resamples a full thermal-domain frame into the RGB domain."""
+        if self.to_rgb_maps is None:
+            return thermal_frame
+        return cv2.remap(thermal_frame, *self.to_rgb_maps, cv2.INTER_LINEAR)
+
+    # -------- Persistence --------
+    def save(self):
+        if self.matrix is None:
+            return
+        os.makedirs(os.path.dirname(self.calibration_path) or ".", exist_ok=True)
+        np.savez(
+            self.calibration_path,
+            matrix=self.matrix,
+            kind=self.kind,
+            rgb_size=self.rgb_size,
+            thermal_size=self.thermal_size,
+            to_thermal_1=self.to_thermal_maps[0], to_thermal_2=self.to_thermal_maps[1],
+            to_rgb_1=self.to_rgb_maps[0], to_rgb_2=self.to_rgb_maps[1],
+        )
+
+    def load(self):
+        """Restores a cached calibration; rebuilds the maps if frame sizes changed."""
+        if not os.path.exists(self.calibration_path):
+            return False
+        data = np.load(self.calibration_path)
+        self.matrix = data["matrix"]
+        self.kind = str(data["kind"])
+        if tuple(data["rgb_size"]) == self.rgb_size and tuple(data["thermal_size"]) == self.thermal_size:
+            self.to_thermal_maps = (data["to_thermal_1"], data["to_thermal_2"])
+            self.to_rgb_maps = (data["to_rgb_1"], data["to_rgb_2"])
+        else:
+            self._build_maps()
+            self.save()
+        return True
@@ -0,0 +1,289 @@
+# batch_reprocess.py
+# --------------------------------
+# Headless re-processing of recorded videos (data/videos/*.avi, lossless
+# *.mkv and raw *.frames recordings) through
+# LandmarkDetector -> AlignmentLogic -> ThermalProcessor, writing one
+# binary session (.tses) per video that ml_stage reads directly.
+#
+#   python -m core.batch_reprocess                        # all of data/videos
+#   python -m core.batch_reprocess data/videos out/ --workers 8 --chunk 1800 --csv
+#
+# Long videos are split into chunks of frames, each started `warmup`
+# frames early so detector/tracker state has settled by the first kept
+# frame. Finished chunks are saved as parts, so an interrupted run
+# resumes where it stopped; videos whose session already exists are skipped.
+# Frame times come from the recorder's .timestamps.npy sidecar when present.
+# Recordings marked as annotated (landmark overlay drawn in) are refused.
+# Raw radiometric (16-bit) recordings are converted to °C like live capture.
+# --------------------------------
+
+import os
+import re
+import glob
+import time
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from core.alignment_logic import AlignmentLogic
+from core.thermal_processor import ThermalProcessor
+from core.session_store import SessionWriter, SESSION_EXT, session_to_csv
+from core.video_recorder import open_capture, ANNOTATED_EXT
+from core.radiometric import RadiometricConverter
+
+
+# -------- CONFIGURATION --------
+VIDEO_DIR = "data/videos"
+OUTPUT_DIR = "data/sessions_reprocessed"
+CALIBRATION_PATH = "data/calibration/alignment.npz"
+
+NUM_WORKERS = os.cpu_count() or 1
+CHUNK_FRAMES = 1800         # frames per task (0 = one task per video)
+WARMUP_FRAMES = 15          # frames decoded before each chunk and discarded
+BATCH_FRAMES = 64           # frames per extract_stimulus_batch call
+VIDEO_PATTERNS = ("*.avi", "*.mkv", "*.frames")
+# --------------------------------
+
+
+# Per-process pipeline, built on first use in each worker
+_pipeline = None
+
+
+def _get_pipeline(tracking):
+    global _pipeline
+    if _pipeline is None or _pipeline[0].tracking != tracking:
+        from core.landmark_detector import LandmarkDetector  # mediapipe loads in the worker
+        _pipeline = (
+            LandmarkDetector(tracking=tracking),
+            AlignmentLogic(calibration_path=CALIBRATION_PATH),
+            ThermalProcessor(),
+            RadiometricConverter(),
+        )
+    return _pipeline
+
+
+def _session_id(path):
+    return os.path.splitext(os.path.basename(path.rstrip(os.sep)))[0]
+
+
+def video_info(path):
+    """(frame_count, fps, start POSIX time) of a recording."""
+    cap = open_capture(path)
+    if not cap.isOpened():
+        raise IOError(f"cannot open {path}")
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 20.0
+    cap.release()
+    # start_recording names files <user id>_<unix time>.avi
+    match = re.search(r"_(\d{9,})$", _session_id(path))
+    if match:
+        start = float(match.group(1))
+    else:
+        start = os.path.getmtime(path) - max(count, 0) / fps
+    return count, fps, start
+
+
+def is_annotated(path):
+    """Whether VideoRecorder marked the recording as carrying the landmark overlay."""
+    return os.path.exists(os.path.splitext(path.rstrip(os.sep))[0] + ANNOTATED_EXT)
+
+
+def frame_offsets(path):
+    """
+    Seconds since the first frame from the <base>.timestamps.npy sidecar that
+    VideoRecorder writes, or None (frames are then assumed evenly spaced).
+    """
+    sidecar = os.path.splitext(path.rstrip(os.sep))[0] + ".timestamps.npy"
+    if not os.path.exists(sidecar):
+        return None
+    ts = np.load(sidecar)
+    if len(ts) == 0 or not np.isfinite(ts).all():
+        return None
+    return ts - ts[0]
+
+
+def plan_chunks(frame_count, chunk_frames=CHUNK_FRAMES):
+    """[(start, end), ...] frame ranges; one open-ended range if the count is unknown."""
+    if chunk_frames <= 0 or frame_count <= 0:
+        return [(0, None)]
+    return [(s, min(s + chunk_frames, frame_count)) for s in range(0, frame_count, chunk_frames)]
+
+
+def process_chunk(video_path, part_path, start, end, fps, start_time,
+                  warmup=WARMUP_FRAMES, tracking=False):
+    """
+    Runs the pipeline over frames [start, end) of one video and saves the
+    frames with a detected face to part_path (.npz). Returns the frame count kept.
+    """
+    detector, aligner, processor, radiometric = _get_pipeline(tracking)
+    detector.reset_tracking()
+
+    cap = open_capture(video_path)
+    pos = max(0, start - warmup)
+    if pos:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+
+    kept_idx, kept_frames, kept_landmarks = [], [], []
+    idx_out, landmarks_out, roi_out = [], [], []
+    roi_columns = None
+
+    def flush():
+        nonlocal roi_columns
+        if not kept_frames:
+            return
+        stim = processor.extract_stimulus_batch(np.stack(kept_frames), np.stack(kept_landmarks))
+        roi_columns = list(stim.keys())
+        roi_out.append(np.stack([stim[name] for name in roi_columns], axis=1))
+        idx_out.extend(kept_idx)
+        landmarks_out.extend(kept_landmarks)
+        kept_idx.clear(); kept_frames.clear(); kept_landmarks.clear()
+
+    while end is None or pos < end:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        thermal_frame = frame
+        if frame.dtype == np.uint16:
+            thermal_frame = radiometric.to_celsius(frame)
+            frame = radiometric.preview(frame)
+        landmarks = detector.get_landmarks(frame, timestamp=pos / fps)
+        if landmarks is not None and pos >= start:
+            kept_idx.append(pos)
+            kept_frames.append(thermal_frame)
+            kept_landmarks.append(aligner.map_points(landmarks))
+            if len(kept_frames) >= BATCH_FRAMES:
+                flush()
+        pos += 1
+    cap.release()
+    flush()
+
+    idx = np.asarray(idx_out, dtype=np.int64)
+    offsets = frame_offsets(video_path)
+    if offsets is not None and len(idx) and idx.max() < len(offsets):
+        seconds = offsets[idx]
+    else:
+        seconds = idx / fps
+    tmp_path = part_path + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        frames=idx + 1,
+        timestamps=start_time + seconds,
+        landmarks=(np.asarray(landmarks_out).reshape(len(idx), -1, 2) if landmarks_out
+                   else np.empty((0, len(detector.LANDMARK_68_INDEX), 2), dtype=int)),
+        roi=np.vstack(roi_out) if roi_out else np.empty((0, 0)),
+        roi_columns=np.array(roi_columns or [], dtype=str),
+    )
+    os.replace(tmp_path, part_path)   # a part only exists once complete
+    return len(idx)
+
+
+def merge_parts(parts_dir, session_path, write_csv=False):
+    """Concatenates chunk parts (in frame order) into one binary session."""
+    tmp_path = session_path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    writer = None
+    for part in sorted(glob.glob(os.path.join(parts_dir, "*.npz"))):
+        data = np.load(part)
+        if len(data["frames"]) == 0:
+            continue
+        if writer is None:
+            writer = SessionWriter(tmp_path, data["landmarks"].shape[1], data["roi_columns"].tolist())
+        writer.append(data["frames"], data["timestamps"], data["landmarks"], data["roi"])
+    if writer is None:
+        return None
+    writer.close()
+    os.replace(tmp_path, session_path)
+    shutil.rmtree(parts_dir)
+    if write_csv:
+        session_to_csv(session_path)
+    return session_path
+
+
+def reprocess(video_dir=VIDEO_DIR, output_dir=OUTPUT_DIR, num_workers=NUM_WORKERS,
+              chunk_frames=CHUNK_FRAMES, warmup=WARMUP_FRAMES, tracking=False, write_csv=False):
+    os.makedirs(output_dir, exist_ok=True)
+    videos = sorted(
+        path for pattern in VIDEO_PATTERNS
+        for path in glob.glob(os.path.join(video_dir, pattern))
+    )
+
+    # -------- Plan (skipping finished sessions and parts) --------
+    jobs = {}
+    tasks = []
+    for video in videos:
+        session_id = _session_id(video)
+        session_path = os.path.join(output_dir, session_id + SESSION_EXT)
+        if os.path.exists(session_path):
+            print(f"[DONE] {session_id}")
+            continue
+        if is_annotated(video):
+            print(f"[SKIP] {session_id}: frames carry the landmark overlay; record clean frames to reprocess")
+            continue
+        parts_dir = os.path.join(output_dir, session_id + ".parts")
+        try:
+            count, fps, start_time = video_info(video)
+        except Exception as e:
+            print(f"[FAIL] {session_id}: {e}")
+            continue
+        os.makedirs(parts_dir, exist_ok=True)
+        jobs[video] = (session_id, session_path, parts_dir)
+        for start, end in plan_chunks(count, chunk_frames):
+            part_path = os.path.join(parts_dir, f"{start:09d}.npz")
+            if not os.path.exists(part_path):
+                tasks.append((video, part_path, start, end, fps, start_time, warmup, tracking))
+
+    print(f"{len(videos)} videos, {len(jobs)} to process, {len(tasks)} chunks pending")
+
+    # -------- Run --------
+    # A failed chunk only fails its own video; its finished parts are kept
+    # so the next run resumes there.
+    build_start = time.perf_counter()
+    failed = set()
+
+    def report(done, task, run):
+        try:
+            kept = run()
+        except Exception as e:
+            failed.add(task[0])
+            print(f"[{done}/{len(tasks)}] {os.path.basename(task[0])} frames {task[2]}+: FAILED ({e})")
+        else:
+            print(f"[{done}/{len(tasks)}] {os.path.basename(task[0])} frames {task[2]}+: {kept} kept")
+
+    if num_workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(num_workers, len(tasks))) as pool:
+            futures = {pool.submit(process_chunk, *task): task for task in tasks}
+            for done, future in enumerate(as_completed(futures), start=1):
+                report(done, futures[future], future.result)
+    else:
+        for done, task in enumerate(tasks, start=1):
+            report(done, task, lambda: process_chunk(*task))
+
+    # -------- Merge --------
+    for video, (session_id, session_path, parts_dir) in jobs.items():
+        if video in failed:
+            print(f"[FAIL] {session_id}: not merged, re-run to retry the failed chunks")
+        elif merge_parts(parts_dir, session_path, write_csv) is None:
+            print(f"[SKIP] {session_id}: no face detected")
+        else:
+            print(f"[OK] {session_path}")
+
+    print(f"Reprocessed in {time.perf_counter() - build_start:.1f}s ({num_workers} workers)")
+
+
+# -------- Run manually --------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-run the capture pipeline over recorded videos")
+    parser.add_argument("video_dir", nargs="?", default=VIDEO_DIR)
+    parser.add_argument("output_dir", nargs="?", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS)
+    parser.add_argument("--chunk", type=int, default=CHUNK_FRAMES, help="frames per task (0 = whole video)")
+    parser.add_argument("--warmup", type=int, default=WARMUP_FRAMES)
+    parser.add_argument("--tracking", action="store_true", help="optical-flow tracking between keyframes")
+    parser.add_argument("--csv", action="store_true", help="also write the wide CSV next to each session")
+    args = parser.parse_args()
+
+    reprocess(args.video_dir, args.output_dir, args.workers, args.chunk,
+              args.warmup, args.tracking, args.csv)
@@ -1,18 +1,190 @@
 import cv2
+import time
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+# A single captured frame with its sequence number and capture time
+# (time.monotonic() seconds, taken right after the driver returned it)
+CapturedFrame = namedtuple("CapturedFrame", ["frame_id", "timestamp", "image"])
+
 
 class CameraManager:
-    def __init__(self, camera_id=0):
-        self.cap = cv2.VideoCapture(camera_id)
+    def __init__(self, camera_id=0, threaded=False, buffer_size=4, raw_y16=False, source=None):
+        """
+        raw_y16: request the sensor's raw 16-bit radiometric stream; frames
+            are (h, w) uint16 views of the driver buffer (convert with
+            core.radiometric.RadiometricConverter)
+        source: object with the cv2.VideoCapture interface to read instead
+            of a camera (e.g. radiometric.SyntheticY16Source)
+        """
+        self.cap = source if source is not None else cv2.VideoCapture(camera_id)
+        self.raw_y16 = raw_y16
 
         # Set thermal camera resolution: 256x192 (≈0.05MP, 4:3)
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 256)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 192)
+        if raw_y16 and source is None:
+            # Ask the driver for Y16 and hand the buffer over unconverted
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"Y16 "))
+            self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        self.frame_size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 256,
+                           int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 192)
+
+        # ---------- THREADED CAPTURE STATE ----------
+        self.threaded = threaded
+        self.buffer_size = buffer_size
+        self._frames = None                 # (buffer_size, h, w, c) ring, allocated on first frame
+        self._frame_ids = np.full(buffer_size, -1, dtype=np.int64)
+        self._timestamps = np.zeros(buffer_size, dtype=np.float64)
+        self._write_id = 0                  # id the grabber will assign to the next frame
+        self._read_id = 0                   # id the consumer expects next
+        self.dropped_frames = 0
+        self.delivered_frames = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
 
-    def read(self):
+        if self.threaded:
+            self.start()
+
+    # -------- Synchronous API --------
+    def read(self, timeout=0.05):
+        if self.threaded:
+            captured = self.read_latest(timeout=timeout)
+            if captured is None:
+                return False, None
+            return True, captured.image
         if self.cap.isOpened():
-            return self.cap.read()
+            ret, frame = self.cap.read()
+            if ret and self.raw_y16:
+                frame = self._y16_view(frame)
+            return ret, frame
         return False, None
 
+    def _y16_view(self, buffer):
+        """
+        Reinterprets a raw driver buffer (bytes, however OpenCV shaped them)
+        as an (h, w) uint16 image without copying.
+        """
+        if buffer.dtype == np.uint16 and buffer.ndim == 2:
+            return buffer
+        w, h = self.frame_size
+        return np.ascontiguousarray(buffer).reshape(-1).view(np.uint16)[:w * h].reshape(h, w)
+
+    def read_frame(self, timeout=0.05):
+        """Like read(), but returns a CapturedFrame (or None) in both modes."""
+        if self.threaded:
+            return self.read_latest(timeout=timeout)
+        ret, frame = self.read()
+        if not ret:
+            return None
+        captured = CapturedFrame(self._write_id, time.monotonic(), frame)
+        self._write_id += 1
+        return captured
+
+    # -------- Threaded API --------
+    def start(self):
+        if self._running or not self.cap.isOpened():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._grab_loop, daemon=True)
+        self._thread.start()
+
+    def _grab_loop(self):
+        scratch = None
+        while self._running:
+            if not self.cap.grab():
+                time.sleep(0.005)
+                continue
+            timestamp = time.monotonic()
+            ok, scratch = self.cap.retrieve(scratch)
+            if not ok or scratch is None:
+                continue
+            image = self._y16_view(scratch) if self.raw_y16 else scratch
+
+            with self._cond:
+                if self._frames is None or self._frames.shape[1:] != image.shape or self._frames.dtype != image.dtype:
+                    self._frames = np.empty((self.buffer_size,) + image.shape, dtype=image.dtype)
+                slot = self._write_id % self.buffer_size
+                np.copyto(self._frames[slot], image)
+                self._frame_ids[slot] = self._write_id
+                self._timestamps[slot] = timestamp
+                self._write_id += 1
+                self._cond.notify_all()
+
+    def _wait_for_frame(self, timeout):
+        # Caller must hold self._cond
+        return self._cond.wait_for(
+            lambda: self._write_id > self._read_id or not self._running,
+            timeout
+        ) and self._write_id > self._read_id
+
+    def _take(self, frame_id):
+        # Caller must hold self._cond
+        slot = frame_id % self.buffer_size
+        self._read_id = frame_id + 1
+        self.delivered_frames += 1
+        return CapturedFrame(
+            int(self._frame_ids[slot]),
+            float(self._timestamps[slot]),
+            self._frames[slot].copy()
+        )
+
+    def read_latest(self, timeout=None):
+        """
+        Returns the newest captured frame, skipping any older frames
+        that were never consumed. None if nothing arrives in time.
+        """
+        with self._cond:
+            if not self._wait_for_frame(timeout):
+                return None
+            latest_id = self._write_id - 1
+            self.dropped_frames += latest_id - self._read_id
+            return self._take(latest_id)
+
+    def read_next(self, timeout=None):
+        """
+        Returns frames in capture order without skipping. Frames are only
+        lost (and counted as dropped) if the consumer falls more than
+        buffer_size frames behind the grabber.
+        """
+        with self._cond:
+            if not self._wait_for_frame(timeout):
+                return None
+            oldest_id = self._write_id - self.buffer_size
+            if self._read_id < oldest_id:
+                self.dropped_frames += oldest_id - self._read_id
+                self._read_id = oldest_id
+            return self._take(self._read_id)
+
+    def frame_rate(self, default=20.0):
+        """Driver-reported fps, else the rate measured over the ring, else default."""
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap.isOpened() else 0.0
+        if fps and fps > 0:
+            return fps
+        with self._cond:
+            ts = np.sort(self._timestamps[self._frame_ids >= 0])
+        if len(ts) >= 2 and ts[-1] > ts[0]:
+            return (len(ts) - 1) / (ts[-1] - ts[0])
+        return default
+
+    def stats(self):
+        with self._cond:
+            return {
+                "captured": self._write_id,
+                "delivered": self.delivered_frames,
+                "dropped": self.dropped_frames,
+                "pending": self._write_id - self._read_id,
+            }
+
     def release(self):
+        if self._running:
+            self._running = False
+            with self._cond:
+                self._cond.notify_all()
+            self._thread.join(timeout=1.0)
+            self._thread = None
         if self.cap.isOpened():
             self.cap.release()
@@ -1,43 +1,186 @@
 import csv
 import os
+import re
+import time
+import queue
 import datetime
+import threading
+
+import numpy as np
+
+from core.session_store import SessionWriter, SESSION_EXT
 
 class DataLogger:
-    def __init__(self, output_dir="data/output_logs"):
+    def __init__(self, output_dir="data/output_logs", async_mode=False,
+                 batch_size=64, flush_interval=1.0, session_format="csv", user_id=None):
         self.output_dir = output_dir
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
-        
-        # Create a unique filename based on the current time
+
+        # Create a unique filename based on the current time (and the user,
+        # when known: session_<user id>_YYYYmmdd_HHMMSS)
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        if user_id is not None:
+            timestamp = re.sub(r"[^\w.-]", "_", str(user_id)) + "_" + timestamp
         self.file_path = os.path.join(self.output_dir, f"session_{timestamp}.csv")
         self.initialized = False
 
-    def log_frame(self, frame_count, thermal_landmarks, stimulus_data):
+        # "csv", "binary" (columnar .tses, see core/session_store.py) or "both"
+        self.session_format = session_format
+        self.write_csv = session_format in ("csv", "both")
+        self.write_binary = session_format in ("binary", "both")
+        self.binary_path = os.path.splitext(self.file_path)[0] + SESSION_EXT
+        self.binary_writer = None
+
+        # ---------- ASYNC WRITER ----------
+        # In async mode log_frame only queues a compact record; a background
+        # thread formats rows and flushes them in batches.
+        self.async_mode = async_mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.records_written = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self._writer_thread = None
+
+        # Optional core.metrics.PipelineMetrics; receives batch flush timings
+        self.metrics = None
+
+    def log_frame(self, frame_count, thermal_landmarks, stimulus_data, timestamp=None):
         """
-        Saves frame data. 
+        Saves frame data.
         thermal_landmarks: np.array of 68 [x, y]
         stimulus_data: dict of {point_name: temperature}
+        timestamp: datetime of the frame (defaults to now)
         """
+        now = timestamp or datetime.datetime.now()
+        if self.async_mode:
+            if self._writer_thread is None:
+                self._start_writer()
+            self.queue.put((
+                frame_count,
+                now,
+                np.array(thermal_landmarks, copy=True),
+                dict(stimulus_data)
+            ))
+            return
+
+        if self.write_binary:
+            self._append_binary([(frame_count, now, thermal_landmarks, stimulus_data)])
+        if not self.write_csv:
+            return
+
+        row = self._build_row(frame_count, now, thermal_landmarks, stimulus_data)
+
+        # Write to CSV
+        with open(self.file_path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=row.keys())
+            if not self.initialized:
+                writer.writeheader()
+                self.initialized = True
+            writer.writerow(row)
+
+    def _build_row(self, frame_count, timestamp, thermal_landmarks, stimulus_data):
         # Prepare the row
         row = {
             "frame": frame_count,
-            "timestamp": datetime.datetime.now().isoformat()
+            "timestamp": timestamp.isoformat()
         }
-        
+
         # Flatten the 68 landmarks into x0, y0, x1, y1... columns
         for i, (x, y) in enumerate(thermal_landmarks):
             row[f"lm_{i}_x"] = x
             row[f"lm_{i}_y"] = y
-            
+
         # Add the temperature stimulus points
         row.update(stimulus_data)
+        return row
 
-        # Write to CSV
-        with open(self.file_path, 'a', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=row.keys())
-            if not self.initialized:
-                writer.writeheader()
-                self.initialized = True
-            writer.writerow(row)
-            
\ No newline at end of file
+    def _append_binary(self, records):
+        if self.binary_writer is None:
+            _, _, landmarks, stimulus = records[0]
+            self.binary_writer = SessionWriter(self.binary_path, len(landmarks), list(stimulus.keys()))
+        columns = self.binary_writer.roi_columns
+        self.binary_writer.append(
+            [r[0] for r in records],
+            [r[1].timestamp() for r in records],
+            np.stack([np.asarray(r[2]) for r in records]),
+            [[r[3].get(name, 0) for name in columns] for r in records]
+        )
+        self.binary_writer.flush()
+
+    # -------- Async writer thread --------
+    def _start_writer(self):
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+
+    def _writer_loop(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+
+        f = open(self.file_path, 'a', newline='') if self.write_csv else None
+        writer = None
+        done = False
+        try:
+            while not done:
+                try:
+                    record = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    if record is None:
+                        done = True
+                    else:
+                        batch.append(record)
+                except queue.Empty:
+                    pass
+
+                if done or len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                    if batch:
+                        writer = self._flush_batch(f, writer, batch)
+                        batch = []
+                    deadline = time.monotonic() + self.flush_interval
+        finally:
+            if f is not None:
+                f.close()
+
+    def _flush_batch(self, f, writer, batch):
+        start = time.perf_counter()
+        if self.write_binary:
+            self._append_binary(batch)
+        if self.write_csv:
+            rows = [self._build_row(*record) for record in batch]
+            if writer is None:
+                writer = csv.DictWriter(f, fieldnames=rows[0].keys())
+                if not self.initialized:
+                    writer.writeheader()
+                    self.initialized = True
+            writer.writerows(rows)
+            f.flush()
+
+        self.records_written += len(batch)
+        self.last_flush_latency = time.perf_counter() - start
+        self.max_flush_latency = max(self.max_flush_latency, self.last_flush_latency)
+        if self.metrics is not None:
+            self.metrics.observe("logger_flush", self.last_flush_latency)
+        return writer
+
+    def session_paths(self):
+        """Paths of the session outputs this logger writes."""
+        return [p for p, on in ((self.file_path, self.write_csv), (self.binary_path, self.write_binary)) if on]
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "records_written": self.records_written,
+            "last_flush_latency": self.last_flush_latency,
+            "max_flush_latency": self.max_flush_latency,
+        }
+
+    def close(self):
+        """Flushes any queued records and stops the writer thread."""
+        if self._writer_thread is not None:
+            self.queue.put(None)
+            self._writer_thread.join()
+            self._writer_thread = None
+        if self.binary_writer is not None:
+            self.binary_writer.close()
+            self.binary_writer = None
@@ -0,0 +1,31 @@
+import numpy as np
+
+_disk_cache = {}
+
+
+def _disk_offsets(radius):
+    # (dy, dx) offsets of a filled disk, computed once per radius
+    if radius not in _disk_cache:
+        r = np.arange(-radius, radius + 1)
+        dy, dx = np.meshgrid(r, r, indexing="ij")
+        inside = dy * dy + dx * dx <= radius * radius
+        _disk_cache[radius] = (dy[inside], dx[inside])
+    return _disk_cache[radius]
+
+
+def draw_landmarks(image, points, color, radius=2):
+    """
+    Draws every point as a filled dot in one vectorized write
+    (replaces one cv2.circle call per landmark). Modifies image in place.
+    points: (N, 2) x/y; points outside the image are clipped away.
+    """
+    points = np.asarray(points)
+    if points.size == 0:
+        return image
+    dy, dx = _disk_offsets(radius)
+    ys = (points[:, 1, None].astype(np.intp) + dy).ravel()
+    xs = (points[:, 0, None].astype(np.intp) + dx).ravel()
+    h, w = image.shape[:2]
+    keep = (ys >= 0) & (ys < h) & (xs >= 0) & (xs < w)
+    image[ys[keep], xs[keep]] = color
+    return image
@@ -0,0 +1,111 @@
+import threading
+import numpy as np
+
+from core.stimulus_blocks import STIMULUS_BLOCKS, LOOP_DURATION, feature_names_for
+
+
+class OnlineFeatureAccumulator:
+    """
+    Builds the ml_stage feature vector while frames arrive.
+    Keeps running per-(loop, block, ROI) sums and counts in the same
+    layout extract_features produces, so the vector is ready the moment
+    recording stops without re-reading the session file.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.t0 = None
+            self.max_t = 0.0
+            self.rois = None
+            self.sums = np.zeros((0, len(STIMULUS_BLOCKS), 0, 2))   # (loops, blocks, rois, mean/std)
+            self.counts = np.zeros((0, len(STIMULUS_BLOCKS), 0), dtype=np.int64)
+            self.frames = 0
+
+    def add(self, timestamp, stimulus_data, position=None):
+        """
+        timestamp: absolute seconds (the first frame anchors t = 0)
+        stimulus_data: ThermalProcessor output {<roi>_mean, <roi>_std, ...}
+        position: (loop index, [block indices]) from core.session.StimulusScheduler;
+            when given it replaces the timestamp arithmetic, matching
+            extract_features on a session with markers
+        """
+        with self._lock:
+            if self.t0 is None:
+                self.t0 = timestamp
+                self.rois = sorted(
+                    key[:-len("_mean")] for key in stimulus_data
+                    if key.endswith("_mean") and key[:-len("_mean")] + "_std" in stimulus_data
+                )
+                self.sums = np.zeros((0, len(STIMULUS_BLOCKS), len(self.rois), 2))
+                self.counts = np.zeros((0, len(STIMULUS_BLOCKS), len(self.rois)), dtype=np.int64)
+
+            t = timestamp - self.t0
+            self.frames += 1
+            self.max_t = max(self.max_t, t)
+
+            if position is not None:
+                loop_idx, blocks = position
+                if loop_idx < 0:
+                    return
+                self._grow(loop_idx + 1)
+                values = self._values(stimulus_data)
+                for block_idx in blocks:
+                    self.sums[loop_idx, block_idx] += values
+                    self.counts[loop_idx, block_idx] += 1
+                return
+
+            self._grow(int(self.max_t // LOOP_DURATION) + 1)
+
+            # Same boundary arithmetic as features.assign_blocks
+            loop_idx = int(t // LOOP_DURATION)
+            if loop_idx > 0 and t < loop_idx * LOOP_DURATION:
+                loop_idx -= 1
+            loop_start = loop_idx * LOOP_DURATION
+            if t < 0 or t >= loop_start + LOOP_DURATION:
+                return
+
+            values = self._values(stimulus_data)
+
+            for block_idx, (_, t_start, t_end) in enumerate(STIMULUS_BLOCKS):
+                if loop_start + t_start <= t <= loop_start + t_end:
+                    self.sums[loop_idx, block_idx] += values
+                    self.counts[loop_idx, block_idx] += 1
+
+    def _values(self, stimulus_data):
+        return np.array([
+            [stimulus_data[f"{roi}_mean"], stimulus_data[f"{roi}_std"]]
+            for roi in self.rois
+        ], dtype=float)
+
+    def _grow(self, num_loops):
+        extra = num_loops - len(self.sums)
+        if extra <= 0:
+            return
+        self.sums = np.concatenate([self.sums, np.zeros((extra,) + self.sums.shape[1:])])
+        self.counts = np.concatenate([self.counts, np.zeros((extra,) + self.counts.shape[1:], dtype=np.int64)])
+
+    def totals(self):
+        """Mid-session view: copies of the running sums/counts plus their ROI order."""
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "elapsed": self.max_t,
+                "rois": list(self.rois or []),
+                "sums": self.sums.copy(),
+                "counts": self.counts.copy(),
+            }
+
+    def features(self):
+        """Returns (X, feature_names) exactly as extract_features lays them out."""
+        with self._lock:
+            counts = self.counts[..., None]
+            X = np.where(counts > 0, self.sums / np.maximum(counts, 1), 0.0)
+            return X.ravel(), feature_names_for(len(self.sums), self.rois or [])
+
+    def predict(self, scorer):
+        """Scores the current vector with an ml_stage OceanScorer or NumpyOceanScorer."""
+        X, _ = self.features()
+        return scorer.score_features(X)[0]
@@ -0,0 +1,395 @@
+import time
+import queue
+import atexit
+import threading
+import traceback
+import multiprocessing as mp
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# len(LandmarkDetector.LANDMARK_68_INDEX); kept here so the GUI process
+# does not have to import mediapipe to size the result table
+NUM_LANDMARKS = 69
+
+# Per-slot state machine (guarded by FrameBus.lock)
+FREE, WRITING, PENDING, BUSY, DONE = range(5)
+
+# Worker-side stage timings stored per slot (seconds, NaN if not run); a raw
+# Y16 frame's conversion counts towards "detect", whose input it prepares
+WORKER_STAGES = ("detect", "align", "stimulus")
+
+
+def stimulus_columns(processor):
+    """Column order of ThermalProcessor.extract_stimulus_data, as stored in the result table."""
+    return [f"{name}_{stat}" for name in processor.region_names for stat in ("mean", "std")]
+
+
+def _layout(frame_shape, dtype, slots, num_landmarks, num_roi):
+    """name -> (shape, dtype) of every array in the shared block."""
+    return {
+        "frames": ((slots,) + tuple(frame_shape), np.dtype(dtype)),
+        "state": ((slots,), np.dtype(np.int32)),
+        "seq": ((slots,), np.dtype(np.int64)),
+        "frame_id": ((slots,), np.dtype(np.int64)),
+        "timestamp": ((slots,), np.dtype(np.float64)),
+        "record": ((slots,), np.dtype(np.int8)),
+        "found": ((slots,), np.dtype(np.int8)),
+        "landmarks": ((slots, num_landmarks, 2), np.dtype(np.int64)),
+        "thermal_landmarks": ((slots, num_landmarks, 2), np.dtype(np.int64)),
+        "roi": ((slots, num_roi), np.dtype(np.float64)),
+        "timings": ((slots, len(WORKER_STAGES)), np.dtype(np.float64)),
+    }
+
+
+class FrameBus:
+    """
+    A ring of frame slots plus a per-slot result table (landmarks, thermal
+    landmarks, ROI values, worker timings) in one
+    multiprocessing.shared_memory block. The capture side copies each
+    frame in once; worker processes read it through a NumPy view by slot
+    index and write their results into the same slot's table row, so
+    neither frames nor results are pickled.
+
+    Slot ownership follows state: FREE -> WRITING (capture copying in)
+    -> PENDING (queued) -> BUSY (a worker has it) -> DONE (results ready)
+    -> FREE once the GUI process has read them. Transitions take `lock`.
+    """
+    def __init__(self, frame_shape, dtype=np.uint8, slots=8, num_landmarks=NUM_LANDMARKS,
+                 num_roi=8, lock=None, name=None):
+        """name: attach to an existing bus (worker side) instead of creating one"""
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.num_landmarks = num_landmarks
+        self.num_roi = num_roi
+        self.lock = lock if lock is not None else mp.get_context("spawn").Lock()
+
+        layout = _layout(self.frame_shape, self.dtype, slots, num_landmarks, num_roi)
+        offsets, size = {}, 0
+        for key, (shape, dt) in layout.items():
+            offsets[key] = size
+            size += -(-int(np.prod(shape)) * dt.itemsize // 64) * 64   # 64-byte aligned
+
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        for key, (shape, dt) in layout.items():
+            setattr(self, key, np.ndarray(shape, dtype=dt, buffer=self.shm.buf, offset=offsets[key]))
+        if self.owner:
+            self.state[:] = FREE
+            self.seq[:] = -1
+
+    @property
+    def spec(self):
+        """Picklable description for FrameBus.attach in another process."""
+        return dict(
+            name=self.shm.name, frame_shape=self.frame_shape, dtype=self.dtype.str,
+            slots=self.slots, num_landmarks=self.num_landmarks, num_roi=self.num_roi,
+            lock=self.lock,
+        )
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(**spec)
+
+    def fits(self, frame):
+        return frame.shape == self.frame_shape and frame.dtype == self.dtype
+
+    def close(self):
+        # Views must go before the mapping can be closed
+        for key in ("frames", "state", "seq", "frame_id", "timestamp", "record", "found",
+                    "landmarks", "thermal_landmarks", "roi", "timings"):
+            self.__dict__.pop(key, None)
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _landmark_detector(**options):
+    from core.landmark_detector import LandmarkDetector   # mediapipe loads in the worker
+    return LandmarkDetector(**options)
+
+
+def _analyze_slot(bus, slot, detector, aligner, processor, radiometric):
+    """Detection, thermal mapping and ROI extraction for one slot, in place."""
+    timings = bus.timings[slot]
+    timings[:] = np.nan
+    frame = thermal_frame = bus.frames[slot]        # view into shared memory
+    timestamp = float(bus.timestamp[slot])
+    timestamp = None if np.isnan(timestamp) else timestamp
+
+    t = time.perf_counter()
+    if radiometric is not None and frame.dtype == np.uint16:
+        thermal_frame = radiometric.to_celsius(frame)
+        frame = radiometric.preview(frame)
+    landmarks = detector.get_landmarks(frame, timestamp=timestamp, frame_id=int(bus.frame_id[slot]))
+    timings[0] = time.perf_counter() - t
+    bus.found[slot] = landmarks is not None
+    if landmarks is None:
+        return
+
+    bus.landmarks[slot] = np.asarray(landmarks)[:bus.num_landmarks]
+    t = time.perf_counter()
+    bus.thermal_landmarks[slot] = aligner.map_points(bus.landmarks[slot])
+    timings[1] = time.perf_counter() - t
+
+    if bus.record[slot]:
+        t = time.perf_counter()
+        stim = processor.extract_stimulus_batch(thermal_frame[None], bus.thermal_landmarks[slot][None])
+        bus.roi[slot] = [stim[key][0] for key in stimulus_columns(processor)]
+        timings[2] = time.perf_counter() - t
+
+
+def _worker_main(spec, tasks, done, aligner, processor, radiometric, detector_factory, detector_options):
+    """Detector process: takes (slot, seq) tasks until it receives None."""
+    detector = detector_factory(**detector_options)
+    bus = FrameBus.attach(spec)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            slot, seq = task
+            with bus.lock:
+                # Skip frames the capture side reclaimed or discarded meanwhile
+                if bus.state[slot] != PENDING or bus.seq[slot] != seq:
+                    continue
+                bus.state[slot] = BUSY
+            try:
+                _analyze_slot(bus, slot, detector, aligner, processor, radiometric)
+            except Exception:
+                traceback.print_exc()
+                bus.found[slot] = False
+            with bus.lock:
+                bus.state[slot] = DONE
+            done.put(slot)
+    finally:
+        bus.close()
+
+
+class ProcessFramePipeline:
+    """
+    Drop-in alternative to FramePipeline that runs detection, thermal
+    mapping and ROI extraction in worker processes (one MediaPipe
+    FaceLandmarker each), fed through a shared-memory FrameBus. Results
+    are handed back in submission order; validation, drawing, logging and
+    recording then run in this process via FrameAnalyzer.complete, on a
+    collector thread that calls on_result(result).
+
+    The bus is sized from the first submitted frame. clear() (a session
+    reset) shuts the workers down and frees the bus; the next submit()
+    starts fresh ones. Workers do not track landmarks between frames,
+    since consecutive frames go to different processes.
+    """
+    def __init__(self, analyzer, on_result, num_workers=2, slots=None, prepare=None,
+                 detector_factory=_landmark_detector, detector_options=None):
+        """
+        slots: frames in flight at most (default: two per worker, plus two)
+        detector_factory(**detector_options): builds a worker's detector;
+            must be importable by name (workers are spawned)
+        """
+        self.analyzer = analyzer
+        self.on_result = on_result
+        self.prepare = prepare
+        self.num_workers = num_workers
+        self.slots = slots or 2 * num_workers + 2
+        self.detector_factory = detector_factory
+        self.detector_options = detector_options if detector_options is not None else dict(tracking=False)
+        self.dropped_frames = 0
+        self.bus = None
+        self._ctx = mp.get_context("spawn")   # fork is unsafe with Qt and MediaPipe threads
+        self._workers = []
+        self._order = deque()                  # (seq, slot, record, timestamp, submitted) in submit order
+        self._order_lock = threading.Lock()
+        self._delivering = False               # collector is handing on a popped frame
+        self._seq = 0
+        self._running = False
+        self._thread = None
+        atexit.register(self.stop)
+
+    def start(self, frame=None):
+        """Starts the workers; without a frame this waits for the first submit()."""
+        if self._running or frame is None:
+            return
+        analyzer = self.analyzer
+        columns = stimulus_columns(analyzer.processor)
+        self.bus = FrameBus(frame.shape, frame.dtype, self.slots, num_roi=len(columns),
+                            lock=self._ctx.Lock())
+        self._columns = columns
+        self._tasks = self._ctx.Queue()
+        self._done = self._ctx.Queue()
+        self._workers = [
+            self._ctx.Process(
+                target=_worker_main,
+                args=(self.bus.spec, self._tasks, self._done, analyzer.aligner, analyzer.processor,
+                      analyzer.radiometric, self.detector_factory, self.detector_options),
+                name=f"detector-{i}",
+                daemon=True,
+            )
+            for i in range(self.num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self._running = True
+        self._thread = threading.Thread(target=self._collect, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, record=False, frame_id=None, timestamp=None):
+        """
+        Copies the frame into a free slot and queues it. When no slot is
+        free, the oldest frame no worker has started yet is dropped instead.
+        """
+        if self.bus is not None and not self.bus.fits(frame):
+            self.stop()
+        if not self._running:
+            self.start(frame)
+        bus = self.bus
+
+        with bus.lock:
+            free = np.flatnonzero(bus.state == FREE)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = self._reclaim_oldest()
+                if slot is None:
+                    self.dropped_frames += 1
+                    return
+            bus.state[slot] = WRITING
+
+        np.copyto(bus.frames[slot], frame)
+        seq = self._seq
+        self._seq += 1
+        bus.seq[slot] = seq
+        bus.frame_id[slot] = -1 if frame_id is None else frame_id
+        bus.timestamp[slot] = np.nan if timestamp is None else timestamp
+        bus.record[slot] = record
+        with self._order_lock:
+            self._order.append((seq, slot, record, timestamp, time.perf_counter()))
+        with bus.lock:
+            bus.state[slot] = PENDING
+        self._tasks.put((slot, seq))
+
+    def _reclaim_oldest(self):
+        # Caller must hold self.bus.lock
+        with self._order_lock:
+            for seq, slot, *_ in self._order:
+                if self.bus.state[slot] == PENDING and self.bus.seq[slot] == seq:
+                    self.dropped_frames += 1
+                    return slot
+        return None
+
+    def _collect(self):
+        while self._running:
+            try:
+                self._done.get(timeout=0.1)
+                while True:
+                    self._done.get_nowait()
+            except queue.Empty:
+                pass
+            except (OSError, ValueError):     # queue closed by stop()
+                break
+            self._deliver_ready()
+            if self._running and not any(worker.is_alive() for worker in self._workers):
+                print("Frame bus: all detector workers exited")
+                break
+
+    def _deliver_ready(self):
+        """Hands on finished frames in submit order (stops at the first unfinished one)."""
+        bus = self.bus
+        while self._running:
+            # Only this thread pops, so the head cannot change in between.
+            # _order_lock is never held while taking bus.lock here, since
+            # submit() nests them the other way round.
+            with self._order_lock:
+                if not self._order:
+                    return
+                seq, slot, record, timestamp, submitted = self._order[0]
+            with bus.lock:
+                state, current = bus.state[slot], bus.seq[slot]
+            if current == seq and state != DONE and state != FREE:
+                return
+            with self._order_lock:
+                self._order.popleft()
+                self._delivering = True
+            try:
+                if current != seq or state == FREE:
+                    continue    # dropped before a worker picked it up
+                result = self._complete(slot, record, timestamp, submitted)
+                if self.prepare is not None:
+                    result = self.prepare(result)
+                self.on_result(result)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                with self._order_lock:
+                    self._delivering = False
+
+    def _complete(self, slot, record, timestamp, submitted):
+        bus, analyzer, metrics = self.bus, self.analyzer, self.analyzer.metrics
+        image = bus.frames[slot].copy()
+        landmarks = thermal_landmarks = stim_data = None
+        if bus.found[slot]:
+            landmarks = bus.landmarks[slot].copy()
+            thermal_landmarks = bus.thermal_landmarks[slot].copy()
+            if record:
+                stim_data = dict(zip(self._columns, bus.roi[slot].tolist()))
+        timings = bus.timings[slot].copy()
+        with bus.lock:
+            bus.state[slot] = FREE
+
+        for name, seconds in zip(WORKER_STAGES, timings):
+            if not np.isnan(seconds):
+                metrics.observe(name, seconds)
+        frame, _, clean_frame = analyzer.prepare_frame(image, thermal=False)
+        result = analyzer.complete(frame, clean_frame, record, timestamp,
+                                   landmarks, thermal_landmarks, stim_data)
+        # Submit-to-result latency, including the time spent queued
+        metrics.observe("frame", time.perf_counter() - submitted)
+        metrics.tick()
+        return result
+
+    def drain(self, timeout=2.0):
+        """
+        Waits until every submitted frame has been delivered (or dropped).
+        Returns False if that took longer than `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while self._running:
+            with self._order_lock:
+                if not self._order and not self._delivering:
+                    return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def clear(self):
+        """Discards every frame in flight and shuts the workers down (restarted on the next submit)."""
+        self.stop()
+
+    def stop(self, timeout=2.0):
+        if not self._running:
+            return
+        self._running = False
+        bus = self.bus
+        with bus.lock:
+            bus.state[bus.state == PENDING] = FREE    # workers skip what is still queued
+        for _ in self._workers:
+            self._tasks.put(None)
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+        for worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self._workers = []
+        for q in (self._tasks, self._done):
+            q.close()
+            q.cancel_join_thread()
+        with self._order_lock:
+            self._order.clear()
+        self.bus = None
+        bus.close()
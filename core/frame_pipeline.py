@@ -0,0 +1,271 @@
+import time
+import queue
+import datetime
+import threading
+import traceback
+from collections import OrderedDict
+
+import numpy as np
+
+from core.drawing import draw_landmarks
+from core.feature_accumulator import OnlineFeatureAccumulator
+from core.metrics import PipelineMetrics
+
+# Recorded frames kept while their LIVE_STREAM detection is in flight
+LIVE_FRAME_BUFFER = 8
+
+
+class FrameAnalyzer:
+    """
+    Runs the per-frame stages of the capture pipeline in order:
+    detect -> map to thermal -> GAN validation -> draw -> stimulus + logging.
+    Holds no Qt objects, so it can run on any thread.
+    Stage timings and detection misses are recorded in self.metrics.
+    """
+    def __init__(self, detector, aligner, validator, processor, logger, metrics=None):
+        self.detector = detector
+        self.aligner = aligner
+        self.validator = validator
+        self.processor = processor
+        self.logger = logger
+        self.video_writer = None       # VideoRecorder (or anything with write(frame, timestamp))
+        self.record_clean = True       # record the frame before landmarks are drawn
+        self.scheduler = None          # core.session.StimulusScheduler marking stimulus blocks
+        self.radiometric = None        # core.radiometric.RadiometricConverter for raw Y16 frames
+        self.frame_counter = 0
+        self.accumulator = OnlineFeatureAccumulator()
+        self.metrics = metrics or PipelineMetrics()
+        self._live_frames = OrderedDict()   # frame_id -> (thermal frame, timestamp), LIVE_STREAM only
+
+    def reset(self):
+        """Forgets the current session: frame count, features and buffered live frames."""
+        self.frame_counter = 0
+        self.accumulator.reset()
+        self._live_frames.clear()
+
+    def process(self, frame, record=False, frame_id=None, timestamp=None):
+        """
+        frame: BGR camera frame (annotated in place), or a raw Y16 frame when
+            self.radiometric is set (stimulus data is then in °C and the
+            result frame is the 8-bit preview)
+        record: log stimulus data / write video for this frame
+        frame_id, timestamp: capture id and monotonic capture time, if known
+        Returns a dict describing the result for the UI.
+        """
+        start = time.perf_counter()
+        try:
+            return self._process(frame, record, frame_id, timestamp)
+        finally:
+            self.metrics.observe("frame", time.perf_counter() - start)
+            self.metrics.tick()
+
+    def _process(self, frame, record, frame_id, timestamp):
+        metrics = self.metrics
+        frame, thermal_frame, clean_frame = self.prepare_frame(frame)
+
+        live = getattr(self.detector, "live_stream", False)
+        if live and record and frame_id is not None:
+            self._live_frames[frame_id] = (thermal_frame, timestamp)
+            while len(self._live_frames) > LIVE_FRAME_BUFFER:
+                self._live_frames.popitem(last=False)
+        elif live and not record:
+            # Paused or stopped: late results must not reach the session
+            self._live_frames.clear()
+
+        # 1. SPEAKING FACES LOGIC: Detect in RGB
+        with metrics.stage("detect"):
+            landmarks = self.detector.get_landmarks(frame, timestamp=timestamp, frame_id=frame_id)
+        thermal_landmarks = stim_data = None
+        source_timestamp = timestamp
+        if landmarks is not None:
+            # 2. MAP TO THERMAL DOMAIN
+            with metrics.stage("align"):
+                thermal_landmarks = self.aligner.map_points(landmarks)
+            if live:
+                # LIVE_STREAM landmarks come from an earlier frame: read the
+                # temperatures from that frame, once; otherwise only draw them
+                source = self._take_live_frame(self.detector.result_frame_id)
+                record_data = source is not None
+                if record_data:
+                    thermal_frame, source_timestamp = source
+            else:
+                record_data = record
+            # Stimulus points (read from the untouched thermal frame)
+            if record_data:
+                with metrics.stage("stimulus"):
+                    stim_data = self.processor.extract_stimulus_data(thermal_frame, thermal_landmarks)
+
+        return self.complete(frame, clean_frame, record, timestamp, landmarks, thermal_landmarks, stim_data,
+                             source_timestamp)
+
+    def _take_live_frame(self, frame_id):
+        """Removes and returns the buffered frame `frame_id` (dropping older ones), or None."""
+        if frame_id is None or frame_id not in self._live_frames:
+            return None
+        while True:
+            key, entry = self._live_frames.popitem(last=False)
+            if key == frame_id:
+                return entry
+
+    def prepare_frame(self, frame, thermal=True):
+        """
+        Splits a captured frame into (frame to detect on and draw over,
+        thermal frame for the stimulus data, clean frame for recording).
+        Raw Y16 frames become an 8-bit preview and a °C frame (skipped when
+        thermal=False).
+        """
+        if self.radiometric is not None and frame.dtype == np.uint16:
+            with self.metrics.stage("radiometric"):
+                raw = frame
+                thermal_frame = self.radiometric.to_celsius(raw) if thermal else None
+                frame = self.radiometric.preview(raw)
+            return frame, thermal_frame, raw
+        thermal_frame = frame.copy()
+        return frame, thermal_frame, thermal_frame
+
+    def complete(self, frame, clean_frame, record, timestamp, landmarks, thermal_landmarks, stim_data,
+                 source_timestamp=None):
+        """
+        The steps after detection: validation, overlay, alignment check and
+        logging. Also used by core.frame_bus, whose worker processes supply
+        the landmarks and stimulus data.
+        stim_data: logged when not None (None = nothing to log for this frame)
+        source_timestamp: capture time of the frame stim_data was read from
+            (defaults to timestamp)
+        """
+        metrics = self.metrics
+        result = {
+            "frame": frame,
+            "validation_frame": None,
+            "landmarks": None,
+            "centered": False,
+            "frame_index": None,
+        }
+        if landmarks is None:
+            metrics.inc("detection_misses")
+            return result
+        result["landmarks"] = landmarks
+
+        # 3. CYCLEGAN VALIDATION (sampled; None when no new validation is ready)
+        with metrics.stage("validate"):
+            result["validation_frame"] = self.validator.validate(frame, thermal_landmarks)
+
+        # 4. DRAW FEEDBACK ON MAIN RGB
+        with metrics.stage("draw"):
+            draw_landmarks(frame, landmarks, (0, 255, 0))
+
+        # 5. ALIGNMENT CHECK
+        nose_x, nose_y = landmarks[30]
+        cx, cy = frame.shape[1]//2, frame.shape[0]//2
+        result["centered"] = abs(nose_x-cx) < 80 and abs(nose_y-cy) < 100
+
+        # 6. DATA LOGGING (Stimulus Points)
+        if stim_data is not None:
+            self.frame_counter += 1
+            result["frame_index"] = self.frame_counter
+            with metrics.stage("log"):
+                now = datetime.datetime.now()
+                self.logger.log_frame(self.frame_counter, thermal_landmarks, stim_data, timestamp=now)
+                position = None
+                if self.scheduler is not None and self.scheduler.started:
+                    position = self.scheduler.update(
+                        self.frame_counter, timestamp if source_timestamp is None else source_timestamp
+                    )
+                self.accumulator.add(now.timestamp(), stim_data, position)
+        if record:
+            # Read once: stop_recording may detach the writer from the GUI thread
+            video_writer = self.video_writer
+            if video_writer:
+                with metrics.stage("video"):
+                    video_writer.write(clean_frame if self.record_clean else frame, timestamp)
+
+        return result
+
+
+class FramePipeline:
+    """
+    Runs a FrameAnalyzer on a worker thread fed through a bounded queue.
+    When the worker falls behind, the oldest pending frame is dropped so
+    the queue never holds more than max_pending frames.
+    on_result(result) is called from the worker thread. A frame that raises
+    is logged and skipped; the worker keeps running.
+    """
+    def __init__(self, analyzer, on_result, max_pending=2, prepare=None):
+        self.analyzer = analyzer
+        self.on_result = on_result
+        self.prepare = prepare          # optional worker-side post-processing (e.g. display images)
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.dropped_frames = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, record=False, frame_id=None, timestamp=None):
+        """Queues a frame for analysis, dropping the oldest one if full."""
+        item = (frame, record, frame_id, timestamp)
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+                    self.dropped_frames += 1
+                except queue.Empty:
+                    pass
+
+    def clear(self):
+        while True:
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+            except queue.Empty:
+                return
+
+    def drain(self, timeout=2.0):
+        """
+        Waits until every queued frame has been processed and delivered.
+        Returns False if that took longer than `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _run(self):
+        while self._running:
+            try:
+                item = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                if item is None:
+                    break
+                result = self.analyzer.process(*item)
+                if self.prepare is not None:
+                    result = self.prepare(result)
+                self.on_result(result)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self.queue.task_done()
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self.clear()
+        self.queue.put(None)
+        self._thread.join(timeout=1.0)
+        self._thread = None
@@ -1,3 +1,7 @@
+import time
+import threading
+from collections import deque
+
 import mediapipe as mp
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
@@ -5,20 +9,43 @@ import numpy as np
 import cv2
 
 class LandmarkDetector:
-    def __init__(self):
+    def __init__(self, tracking=False, keyframe_interval=10,
+                 min_tracked_fraction=0.8, max_fb_error=1.5, bbox_margin=0.2,
+                 live_stream=False, max_in_flight=2, max_result_age=0.5):
+        """
+        tracking: run the full FaceLandmarker only on keyframes and follow the
+            points with pyramidal Lucas-Kanade optical flow in between
+        keyframe_interval: frames between forced re-detections
+        min_tracked_fraction: re-detect when fewer points than this track cleanly
+        max_fb_error: forward-backward flow error (px) above which a point is lost
+        bbox_margin: fraction of the face box added on each side for the flow crop
+        live_stream: use MediaPipe's asynchronous LIVE_STREAM mode; get_landmarks
+            submits the frame and returns the most recent completed result
+            (tracking is not used in this mode)
+        max_in_flight: frames allowed inside the detector before new ones are skipped
+        max_result_age: seconds after which a completed result is considered stale
+        """
         # Path to the model file you just downloaded
-        model_path = 'core/face_landmarker.task' 
-        
+        model_path = 'core/face_landmarker.task'
+
+        self.live_stream = live_stream
+        mode_options = dict(running_mode=vision.RunningMode.VIDEO) # Optimized for GUI
+        if live_stream:
+            mode_options = dict(
+                running_mode=vision.RunningMode.LIVE_STREAM,
+                result_callback=self._on_result
+            )
+
         base_options = python.BaseOptions(model_asset_path=model_path)
         options = vision.FaceLandmarkerOptions(
             base_options=base_options,
             output_face_blendshapes=False,
             output_facial_transformation_matrixes=False,
             num_faces=1,
-            running_mode=vision.RunningMode.VIDEO # Optimized for GUI
+            **mode_options
         )
         self.detector = vision.FaceLandmarker.create_from_options(options)
-        
+
         # Standard 68 index mapping
         self.LANDMARK_68_INDEX = [
             162, 234, 93, 58, 172, 136, 149, 148, 152, 377, 378, 365, 397, 288, 323, 454, 389,
@@ -30,29 +57,210 @@ class LandmarkDetector:
             78, 81, 13, 311, 308, 317, 14, 87
         ]
 
-    def get_landmarks(self, frame):
+        # ---------- TRACKING ----------
+        self.tracking = tracking
+        self.keyframe_interval = keyframe_interval
+        self.min_tracked_fraction = min_tracked_fraction
+        self.max_fb_error = max_fb_error
+        self.bbox_margin = bbox_margin
+        self.lk_params = dict(
+            winSize=(15, 15),
+            maxLevel=2,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03)
+        )
+        self.prev_gray = None
+        self.prev_points = None             # float32 (N, 2) in frame pixels
+        self.frames_since_keyframe = 0
+        self.last_confidence = 0.0
+
+        # ---------- LIVE STREAM ----------
+        self.max_in_flight = max_in_flight
+        self.max_result_age = max_result_age
+        self._lock = threading.Lock()
+        self._pending = {}                  # timestamp_ms -> (frame_id, capture_ts, w, h)
+        self._last_timestamp_ms = -1
+        self._latest = None                 # (frame_id, capture_ts, coords or None)
+        self.result_frame_id = None         # frame_id of the landmarks get_landmarks last returned
+        self.skipped_frames = 0
+
+        # ---------- STATS ----------
+        self.detector_calls = 0
+        self.tracked_frames = 0
+        self._call_times = deque(maxlen=256)
+
+    def get_landmarks(self, frame, timestamp=None, frame_id=None):
+        """
+        frame: BGR image
+        timestamp: capture time in seconds (monotonic); defaults to now
+        frame_id: capture frame id, reported back by latest_result()
+        """
+        if self.live_stream:
+            self.submit(frame, timestamp, frame_id)
+            latest = self.latest_result()
+            # Usually an earlier frame's result: callers that read pixels
+            # with these landmarks must check result_frame_id
+            self.result_frame_id = None if latest is None else latest[0]
+            return None if latest is None else latest[2]
+
+        if not self.tracking:
+            return self._detect(frame, timestamp)
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        points = None
+        if self.prev_points is not None and self.frames_since_keyframe < self.keyframe_interval:
+            points = self._track(gray)
+
+        if points is None:
+            # Keyframe: full detector
+            coords = self._detect(frame, timestamp)
+            self.frames_since_keyframe = 0
+            self.prev_points = None if coords is None else coords.astype(np.float32)
+            self.prev_gray = gray
+            return coords
+
+        self.frames_since_keyframe += 1
+        self.tracked_frames += 1
+        self.prev_points = points
+        self.prev_gray = gray
+        return np.rint(points).astype(int)
+
+    def _timestamp_ms(self, timestamp):
+        """Capture time in ms, forced strictly increasing as MediaPipe requires."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        timestamp_ms = max(int(timestamp * 1000), self._last_timestamp_ms + 1)
+        self._last_timestamp_ms = timestamp_ms
+        return timestamp_ms
+
+    def _to_image(self, frame):
         # 1. Convert BGR to RGB
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
+
         # 2. Create MediaPipe Image object
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
-        
-        # 3. Get timestamp in milliseconds (Required for VIDEO mode)
-        timestamp_ms = int(cv2.getTickCount() / cv2.getTickFrequency() * 1000)
-        
-        # 4. Detect
-        result = self.detector.detect_for_video(mp_image, timestamp_ms)
-        
+        return mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+
+    def _to_coords(self, result, w, h):
         if not result.face_landmarks:
             return None
-            
-        # 5. Extract and Scale Coordinates
-        h, w, _ = frame.shape
-        coords = []
+
+        # Read only the 68-point subset, then scale and round in one pass
         face_lms = result.face_landmarks[0]
-        
-        for idx in self.LANDMARK_68_INDEX:
-            lm = face_lms[idx]
-            coords.append([int(lm.x * w), int(lm.y * h)])
-            
-        return np.array(coords)
\ No newline at end of file
+        coords = np.array([(face_lms[i].x, face_lms[i].y) for i in self.LANDMARK_68_INDEX])
+        coords *= (w, h)
+        return np.rint(coords).astype(int)
+
+    def _detect(self, frame, timestamp=None):
+        mp_image = self._to_image(frame)
+
+        # Timestamp in milliseconds (Required for VIDEO mode), taken at capture when known
+        timestamp_ms = self._timestamp_ms(timestamp)
+
+        result = self.detector.detect_for_video(mp_image, timestamp_ms)
+        self.detector_calls += 1
+        self._call_times.append(time.monotonic())
+
+        h, w = frame.shape[:2]
+        return self._to_coords(result, w, h)
+
+    # -------- LIVE_STREAM mode --------
+    def submit(self, frame, timestamp=None, frame_id=None):
+        """
+        Hands a frame to the asynchronous detector without waiting.
+        Returns False if the detector is saturated and the frame was skipped.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._lock:
+            # Forget frames MediaPipe never answered so they don't block new ones
+            for ts_ms in [k for k, v in self._pending.items() if timestamp - v[1] > self.max_result_age]:
+                del self._pending[ts_ms]
+            if len(self._pending) >= self.max_in_flight:
+                self.skipped_frames += 1
+                return False
+            timestamp_ms = self._timestamp_ms(timestamp)
+            h, w = frame.shape[:2]
+            self._pending[timestamp_ms] = (frame_id, timestamp, w, h)
+
+        self.detector.detect_async(self._to_image(frame), timestamp_ms)
+        self.detector_calls += 1
+        self._call_times.append(time.monotonic())
+        return True
+
+    def _on_result(self, result, output_image, timestamp_ms):
+        # Runs on MediaPipe's thread; match the result to the frame that produced it
+        with self._lock:
+            frame_id, capture_ts, w, h = self._pending.pop(timestamp_ms, (None, None, 0, 0))
+            if capture_ts is None:
+                return
+            if self._latest is not None and self._latest[1] > capture_ts:
+                return  # an older frame finished after a newer one
+            self._latest = (frame_id, capture_ts, self._to_coords(result, w, h))
+
+    def latest_result(self):
+        """(frame_id, capture_timestamp, landmarks) of the newest finished frame, or None if stale."""
+        with self._lock:
+            if self._latest is None:
+                return None
+            if time.monotonic() - self._latest[1] > self.max_result_age:
+                return None
+            return self._latest
+
+    def _track(self, gray):
+        """
+        Propagates prev_points into gray with forward-backward LK flow inside
+        the face bounding box. Returns None when tracking is unreliable.
+        """
+        h, w = gray.shape
+        x_min, y_min = self.prev_points.min(axis=0)
+        x_max, y_max = self.prev_points.max(axis=0)
+        mx = (x_max - x_min) * self.bbox_margin
+        my = (y_max - y_min) * self.bbox_margin
+        x0, y0 = int(max(0, x_min - mx)), int(max(0, y_min - my))
+        x1, y1 = int(min(w, x_max + mx + 1)), int(min(h, y_max + my + 1))
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return None
+
+        offset = np.float32([x0, y0])
+        prev_crop = self.prev_gray[y0:y1, x0:x1]
+        crop = gray[y0:y1, x0:x1]
+        p0 = (self.prev_points - offset).reshape(-1, 1, 2)
+
+        p1, status, _ = cv2.calcOpticalFlowPyrLK(prev_crop, crop, p0, None, **self.lk_params)
+        p0_back, status_back, _ = cv2.calcOpticalFlowPyrLK(crop, prev_crop, p1, None, **self.lk_params)
+
+        fb_error = np.linalg.norm((p0 - p0_back).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (status_back.ravel() == 1) & (fb_error < self.max_fb_error)
+        self.last_confidence = float(good.mean())
+        if self.last_confidence < self.min_tracked_fraction:
+            return None
+
+        # Lost points follow the median motion of the tracked ones
+        p1 = p1.reshape(-1, 2)
+        motion = np.median(p1[good] - p0.reshape(-1, 2)[good], axis=0)
+        p1[~good] = p0.reshape(-1, 2)[~good] + motion
+        return p1 + offset
+
+    def reset_tracking(self):
+        self.prev_gray = None
+        self.prev_points = None
+        self.frames_since_keyframe = 0
+        with self._lock:
+            self._latest = None
+        self.result_frame_id = None
+
+    def detector_rate(self, window=1.0):
+        """Full detector calls per second over the last `window` seconds."""
+        # Read from the metrics thread while the detector thread appends:
+        # iterate a copy, never the live deque
+        times = list(self._call_times)
+        now = time.monotonic()
+        return sum(1 for t in times if now - t <= window) / window
+
+    def stats(self):
+        return {
+            "detector_calls": self.detector_calls,
+            "tracked_frames": self.tracked_frames,
+            "detector_calls_per_sec": self.detector_rate(),
+            "tracking_confidence": self.last_confidence,
+            "skipped_frames": self.skipped_frames,
+        }
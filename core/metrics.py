@@ -0,0 +1,209 @@
+import json
+import time
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+
+
+class RollingHistogram:
+    """Last `size` samples of a duration (seconds); percentiles computed on demand."""
+    def __init__(self, size=512):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def summary(self):
+        if not self.samples:
+            return None
+        ms = np.array(list(self.samples)) * 1000
+        p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+        return {
+            "count": self.count,
+            "mean_ms": float(ms.mean()),
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "max_ms": float(ms.max()),
+        }
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class PipelineMetrics:
+    """
+    Lightweight live instrumentation for the capture pipeline.
+
+    The hot path only appends to a deque or bumps an int (observe / inc /
+    tick); percentiles, gauges and formatting happen when a snapshot is
+    taken (overlay refresh, metrics file, Prometheus scrape).
+    """
+    def __init__(self, histogram_size=512, fps_window=2.0):
+        self.histogram_size = histogram_size
+        self.fps_window = fps_window
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}                # name -> callable returning a number
+        self._frame_times = deque(maxlen=1024)
+        self._file_thread = None
+        self._file_stop = threading.Event()
+
+    # -------- Hot path --------
+    def observe(self, name, seconds):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = RollingHistogram(self.histogram_size)
+        hist.add(seconds)
+
+    def stage(self, name):
+        """with metrics.stage("detect"): ... records the block's duration."""
+        return _StageTimer(self, name)
+
+    def inc(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def tick(self):
+        """Marks one fully processed frame (drives the effective FPS)."""
+        self._frame_times.append(time.monotonic())
+
+    # -------- Read side --------
+    def add_gauge(self, name, fn):
+        """fn() is only called when a snapshot is taken."""
+        self.gauges[name] = fn
+
+    def fps(self):
+        now = time.monotonic()
+        recent = [t for t in list(self._frame_times) if now - t <= self.fps_window]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / max(recent[-1] - recent[0], 1e-6)
+
+    def snapshot(self):
+        gauges = {}
+        for name, fn in list(self.gauges.items()):
+            try:
+                gauges[name] = float(fn())
+            except Exception:
+                gauges[name] = float("nan")
+        return {
+            "time": time.time(),
+            "fps": self.fps(),
+            "stages": {name: h.summary() for name, h in list(self.histograms.items())},
+            "counters": dict(self.counters),
+            "gauges": gauges,
+        }
+
+    def overlay_text(self):
+        """Short multi-line summary for the on-screen overlay."""
+        snap = self.snapshot()
+        lines = [f"{snap['fps']:.1f} fps"]
+        for name, s in snap["stages"].items():
+            if s is not None:
+                lines.append(f"{name}: {s['p50_ms']:.1f} / {s['p95_ms']:.1f} ms")
+        for name, value in {**snap["counters"], **snap["gauges"]}.items():
+            lines.append(f"{name}: {value:g}")
+        return "\n".join(lines)
+
+    def to_prometheus(self, prefix="thermal_pipeline"):
+        """Snapshot in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        out = [
+            f"# TYPE {prefix}_fps gauge",
+            f"{prefix}_fps {snap['fps']:.3f}",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for name, s in snap["stages"].items():
+            if s is None:
+                continue
+            for q, key in ((0.5, "p50_ms"), (0.95, "p95_ms"), (0.99, "p99_ms")):
+                out.append(f'{prefix}_stage_seconds{{stage="{name}",quantile="{q}"}} {s[key] / 1000:.6f}')
+            hist = self.histograms[name]
+            out.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {hist.total:.6f}')
+            out.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {hist.count}')
+        for name, value in snap["counters"].items():
+            out.append(f"# TYPE {prefix}_{name}_total counter")
+            out.append(f"{prefix}_{name}_total {value}")
+        for name, value in snap["gauges"].items():
+            out.append(f"# TYPE {prefix}_{name} gauge")
+            out.append(f"{prefix}_{name} {value:g}")
+        return "\n".join(out) + "\n"
+
+    # -------- Per-session metrics file --------
+    def start_file(self, path, interval=5.0):
+        """Appends a JSON snapshot to path every `interval` seconds until stop_file()."""
+        self.stop_file()
+        self._file_stop.clear()
+
+        def run():
+            with open(path, "a") as f:
+                while not self._file_stop.wait(interval):
+                    f.write(json.dumps(self.snapshot()) + "\n")
+                    f.flush()
+                f.write(json.dumps(self.snapshot()) + "\n")
+
+        self._file_thread = threading.Thread(target=run, daemon=True)
+        self._file_thread.start()
+
+    def stop_file(self):
+        if self._file_thread is not None:
+            self._file_stop.set()
+            self._file_thread.join(timeout=1.0)
+            self._file_thread = None
+
+    def reset(self):
+        self.histograms.clear()
+        self.counters.clear()
+        self._frame_times.clear()
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Serves GET /metrics (Prometheus text) on a background thread."""
+    daemon_threads = True
+
+    def __init__(self, metrics, host="127.0.0.1", port=9108):
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        super().__init__((host, port), MetricsHandler)
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,129 @@
+import time
+
+import cv2
+import numpy as np
+
+# Common for 256x192 radiometric modules: raw counts are Kelvin * 64
+DEFAULT_COEFFS = (-273.15, 1 / 64)
+
+
+class RadiometricConverter:
+    """
+    Raw Y16 sensor counts -> degrees Celsius through a 65536-entry lookup
+    table, so any calibration curve costs one gather per frame.
+    Also renders the 8-bit preview used for display and landmark detection.
+    """
+    def __init__(self, coeffs=DEFAULT_COEFFS, lut=None, colormap=None):
+        """
+        coeffs: polynomial calibration curve, lowest order first:
+            celsius = coeffs[0] + coeffs[1] * raw + coeffs[2] * raw**2 + ...
+        lut: precomputed (65536,) table instead of coeffs (see from_table)
+        colormap: optional cv2.COLORMAP_* for the preview (grayscale if None)
+        """
+        if lut is None:
+            lut = np.polynomial.polynomial.polyval(np.arange(65536, dtype=np.float64), coeffs)
+        self.lut = np.asarray(lut, dtype=np.float32)
+        self.colormap = colormap
+        self._gray = None
+
+    @classmethod
+    def from_table(cls, raw_points, celsius_points, **kwargs):
+        """Calibration from measured (raw, °C) pairs, e.g. blackbody references; linear in between."""
+        order = np.argsort(raw_points)
+        lut = np.interp(
+            np.arange(65536),
+            np.asarray(raw_points, dtype=np.float64)[order],
+            np.asarray(celsius_points, dtype=np.float64)[order],
+        )
+        return cls(lut=lut, **kwargs)
+
+    def to_celsius(self, raw, out=None):
+        """raw: uint16 array -> float32 °C (same shape)."""
+        return np.take(self.lut, raw, out=out)
+
+    def preview(self, raw):
+        """
+        8-bit BGR preview: one min-max normalisation of the raw frame
+        (plus an optional colormap).
+        """
+        if self._gray is None or self._gray.shape != raw.shape:
+            self._gray = np.empty(raw.shape, dtype=np.uint8)
+        cv2.normalize(raw, self._gray, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
+        if self.colormap is not None:
+            return cv2.applyColorMap(self._gray, self.colormap)
+        return cv2.cvtColor(self._gray, cv2.COLOR_GRAY2BGR)
+
+
+def celsius_to_raw(celsius, coeffs=DEFAULT_COEFFS):
+    """Inverse of a linear calibration (used to synthesise raw frames)."""
+    return np.clip(np.rint((np.asarray(celsius) - coeffs[0]) / coeffs[1]), 0, 65535).astype(np.uint16)
+
+
+class SyntheticY16Source:
+    """
+    Deterministic stand-in for a radiometric camera: a warm face-shaped
+    blob (about 34 °C, hotter eyes/nose) drifting over a 24 °C background,
+    with sensor noise, emitted as raw Y16 counts. Mimics the parts of
+    cv2.VideoCapture that CameraManager uses.
+    """
+    def __init__(self, width=256, height=192, fps=25.0, seed=0, coeffs=DEFAULT_COEFFS, realtime=True):
+        """realtime: pace read() at fps like a real sensor"""
+        self.width, self.height = width, height
+        self.fps = fps
+        self.coeffs = coeffs
+        self.realtime = realtime
+        self.rng = np.random.default_rng(seed)
+        self.index = 0
+        self._opened = True
+        self._next = None
+        ys, xs = np.mgrid[0:height, 0:width]
+        self._xs, self._ys = xs.astype(np.float32), ys.astype(np.float32)
+
+    def isOpened(self):
+        return self._opened
+
+    def celsius_frame(self, index):
+        """Ground-truth temperature field for frame `index`."""
+        w, h = self.width, self.height
+        cx = w / 2 + 15 * np.sin(index / 40)
+        cy = h / 2 + 8 * np.cos(index / 55)
+        face = ((self._xs - cx) / (w / 6)) ** 2 + ((self._ys - cy) / (h / 4)) ** 2 <= 1
+        field = np.full((h, w), 24.0, dtype=np.float32)
+        field[face] = 34.0
+        for dx, dy, temp in ((-w / 16, -h / 16, 35.5), (w / 16, -h / 16, 35.5), (0, h / 24, 33.0)):
+            spot = (self._xs - cx - dx) ** 2 + (self._ys - cy - dy) ** 2 <= (w / 40) ** 2
+            field[spot] = temp
+        return field
+
+    def read(self):
+        if not self._opened:
+            return False, None
+        if self.realtime:
+            now = time.monotonic()
+            if self._next is not None and now < self._next:
+                time.sleep(self._next - now)
+            self._next = max(now, self._next or now) + 1.0 / self.fps
+        field = self.celsius_frame(self.index)
+        field += self.rng.normal(0, 0.05, field.shape).astype(np.float32)
+        self.index += 1
+        return True, celsius_to_raw(field, self.coeffs)
+
+    def grab(self):
+        self._pending = self.read()
+        return self._pending[0]
+
+    def retrieve(self, image=None):
+        return self._pending
+
+    def get(self, prop):
+        return {
+            cv2.CAP_PROP_FRAME_WIDTH: self.width,
+            cv2.CAP_PROP_FRAME_HEIGHT: self.height,
+            cv2.CAP_PROP_FPS: self.fps,
+        }.get(prop, 0.0)
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self._opened = False
@@ -0,0 +1,146 @@
+import time
+import threading
+
+from core.stimulus_blocks import STIMULUS_BLOCKS, LOOP_DURATION
+from core.session_store import write_markers
+
+MARKERS_VERSION = 1
+
+
+class StimulusScheduler:
+    """
+    Drives the stimulus block sequence (STIMULUS_BLOCKS, repeated
+    every LOOP_DURATION seconds) from a monotonic clock and records, for
+    every (loop, block), the logged frame numbers where it started and
+    ended. Feature extraction slices blocks by these frame ranges, so
+    dropped or late frames never shift a block.
+
+    Block boundaries follow features.assign_blocks: a frame at loop offset
+    t belongs to every block with start <= t <= end.
+    """
+    def __init__(self, blocks=STIMULUS_BLOCKS, loop_duration=LOOP_DURATION,
+                 num_loops=None, clock=time.monotonic):
+        """
+        num_loops: stop presenting blocks after this many loops (None = repeat)
+        clock: monotonic time source; must match the capture timestamps
+        """
+        self.blocks = list(blocks)
+        self.loop_duration = loop_duration
+        self.num_loops = num_loops
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.output_paths = []
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.t0 = None
+            self.last_loop = -1
+            self._open = {}         # (loop, block) -> [start_frame, last_frame, start_t, last_t]
+            self._closed = []
+
+    def start(self, now=None, output_paths=()):
+        """Starts the sequence; markers are saved to output_paths as blocks close."""
+        self.reset()
+        self.output_paths = list(output_paths)
+        self.t0 = self.clock() if now is None else now
+
+    @property
+    def started(self):
+        return self.t0 is not None
+
+    def _position(self, now):
+        """(loop index, active block indices) at clock time `now`."""
+        t = now - self.t0
+        if t < 0:
+            return -1, []
+        loop = int(t // self.loop_duration)
+        if self.num_loops is not None and loop >= self.num_loops:
+            return loop, []
+        offset = t - loop * self.loop_duration
+        return loop, [
+            i for i, (_, t_start, t_end) in enumerate(self.blocks)
+            if t_start <= offset <= t_end
+        ]
+
+    def current_blocks(self, now=None):
+        """Names of the blocks that should be on screen now (for presentation)."""
+        if not self.started:
+            return []
+        _, active = self._position(self.clock() if now is None else now)
+        return [self.blocks[i][0] for i in active]
+
+    @property
+    def finished(self):
+        if not self.started or self.num_loops is None:
+            return False
+        return self.clock() - self.t0 >= self.num_loops * self.loop_duration
+
+    def update(self, frame, timestamp=None):
+        """
+        Registers a logged frame (its frame number and monotonic capture
+        time). Returns (loop index, [active block indices]) for that frame.
+        """
+        if not self.started:
+            return -1, []
+        now = self.clock() if timestamp is None else timestamp
+        loop, active = self._position(now)
+        closed = False
+        with self._lock:
+            self.last_loop = max(self.last_loop, loop)
+            keys = {(loop, b) for b in active}
+            for key in [k for k in self._open if k not in keys]:
+                self._close(key)
+                closed = True
+            for key in keys:
+                entry = self._open.get(key)
+                if entry is None:
+                    self._open[key] = [frame, frame, now - self.t0, now - self.t0]
+                else:
+                    entry[1], entry[3] = frame, now - self.t0
+        if closed:
+            self.save()
+        return loop, active
+
+    def _close(self, key):
+        # Caller must hold self._lock
+        start_frame, last_frame, start_t, last_t = self._open.pop(key)
+        loop, block = key
+        self._closed.append({
+            "loop": loop,
+            "block": block,
+            "name": self.blocks[block][0],
+            "start_frame": start_frame,
+            "end_frame": last_frame + 1,
+            "start_time": start_t,
+            "end_time": last_t,
+        })
+
+    def markers(self, final=False):
+        """Marker dict as stored next to the session (final=True closes open blocks)."""
+        with self._lock:
+            if final:
+                for key in list(self._open):
+                    self._close(key)
+            closed = sorted(self._closed, key=lambda m: (m["loop"], m["block"]))
+            return {
+                "version": MARKERS_VERSION,
+                "loop_duration": self.loop_duration,
+                "blocks": [list(b) for b in self.blocks],
+                "num_loops": self.last_loop + 1,
+                "markers": closed,
+            }
+
+    def save(self, final=False):
+        markers = self.markers(final)
+        for path in self.output_paths:
+            write_markers(path, markers)
+        return markers
+
+    def stop(self):
+        """Closes any open block and writes the final markers."""
+        if not self.started:
+            return None
+        markers = self.save(final=True)
+        self.t0 = None
+        return markers
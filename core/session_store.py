@@ -0,0 +1,281 @@
+# session_store.py
+# --------------------------------
+# Columnar binary session format, stored alongside the wide CSV.
+#
+#   session_YYYYmmdd_HHMMSS.tses/
+#       meta.json          column names, landmark count, dtypes
+#       frame.i32          (frames,)        frame counter
+#       timestamp.f64      (frames,)        POSIX seconds
+#       landmarks.i16      (frames, N, 2)   thermal landmark x/y
+#       roi/<name>.f32     (frames,)        one file per ROI stat column
+#       markers.json                        stimulus block markers (optional)
+#
+# Every column is a flat little-endian array, so appending a chunk is a
+# plain binary append and readers can np.memmap each file directly.
+# --------------------------------
+
+import os
+import csv
+import json
+import shutil
+import datetime
+
+import numpy as np
+
+FORMAT_VERSION = 1
+SESSION_EXT = ".tses"
+
+FRAME_DTYPE = np.dtype("<i4")
+TIMESTAMP_DTYPE = np.dtype("<f8")
+LANDMARK_DTYPE = np.dtype("<i2")
+ROI_DTYPE = np.dtype("<f4")
+
+
+def is_binary_session(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, "meta.json"))
+
+
+class SessionWriter:
+    """
+    Appends chunks of frames to a binary session directory.
+    Files stay open between appends; call close() when done.
+    """
+    def __init__(self, path, num_landmarks, roi_columns):
+        self.path = path
+        self.num_landmarks = num_landmarks
+        self.roi_columns = list(roi_columns)
+
+        os.makedirs(os.path.join(path, "roi"), exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["num_landmarks"] != num_landmarks or meta["roi_columns"] != self.roi_columns:
+                raise ValueError(f"Session layout mismatch for {path}")
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({
+                    "version": FORMAT_VERSION,
+                    "num_landmarks": num_landmarks,
+                    "roi_columns": self.roi_columns,
+                    "frame_dtype": FRAME_DTYPE.str,
+                    "timestamp_dtype": TIMESTAMP_DTYPE.str,
+                    "landmark_dtype": LANDMARK_DTYPE.str,
+                    "roi_dtype": ROI_DTYPE.str,
+                }, f, indent=2)
+
+        self._files = {
+            "frame": open(os.path.join(path, "frame.i32"), "ab"),
+            "timestamp": open(os.path.join(path, "timestamp.f64"), "ab"),
+            "landmarks": open(os.path.join(path, "landmarks.i16"), "ab"),
+        }
+        self._roi_files = [
+            open(os.path.join(path, "roi", f"{name}.f32"), "ab")
+            for name in self.roi_columns
+        ]
+
+    def append(self, frames, timestamps, landmarks, roi):
+        """
+        frames: (k,) ints
+        timestamps: (k,) POSIX seconds
+        landmarks: (k, N, 2) ints
+        roi: (k, len(roi_columns)) floats, columns in roi_columns order
+        """
+        landmarks = np.asarray(landmarks, dtype=LANDMARK_DTYPE)
+        if landmarks.shape[1:] != (self.num_landmarks, 2):
+            raise ValueError(f"Expected (k, {self.num_landmarks}, 2) landmarks, got {landmarks.shape}")
+        roi = np.asarray(roi, dtype=ROI_DTYPE).reshape(len(landmarks), len(self.roi_columns))
+
+        self._files["frame"].write(np.asarray(frames, dtype=FRAME_DTYPE).tobytes())
+        self._files["timestamp"].write(np.asarray(timestamps, dtype=TIMESTAMP_DTYPE).tobytes())
+        self._files["landmarks"].write(landmarks.tobytes())
+        for i, f in enumerate(self._roi_files):
+            f.write(np.ascontiguousarray(roi[:, i]).tobytes())
+
+    def flush(self):
+        for f in list(self._files.values()) + self._roi_files:
+            f.flush()
+
+    def close(self):
+        for f in list(self._files.values()) + self._roi_files:
+            f.close()
+        self._files = {}
+        self._roi_files = []
+
+
+class SessionReader:
+    """
+    Memory-maps a binary session. Columns are read-only np.memmap views;
+    nothing is copied until the caller slices or converts them.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.num_landmarks = self.meta["num_landmarks"]
+        self.roi_columns = self.meta["roi_columns"]
+
+        # A writer may have been interrupted mid-chunk: trust the shortest column
+        self.num_frames = min(
+            self._count("frame.i32", FRAME_DTYPE),
+            self._count("timestamp.f64", TIMESTAMP_DTYPE),
+            self._count("landmarks.i16", LANDMARK_DTYPE, self.num_landmarks * 2),
+            *[self._count(os.path.join("roi", f"{name}.f32"), ROI_DTYPE) for name in self.roi_columns]
+        )
+
+        self.frames = self._map("frame.i32", FRAME_DTYPE, (self.num_frames,))
+        self.timestamps = self._map("timestamp.f64", TIMESTAMP_DTYPE, (self.num_frames,))
+        self.landmarks = self._map("landmarks.i16", LANDMARK_DTYPE, (self.num_frames, self.num_landmarks, 2))
+        self.roi = {
+            name: self._map(os.path.join("roi", f"{name}.f32"), ROI_DTYPE, (self.num_frames,))
+            for name in self.roi_columns
+        }
+
+    def __len__(self):
+        return self.num_frames
+
+    def _count(self, name, dtype, per_frame=1):
+        return os.path.getsize(os.path.join(self.path, name)) // (dtype.itemsize * per_frame)
+
+    def _map(self, name, dtype, shape):
+        if shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=shape)
+
+
+# -------- Stimulus markers --------
+# Written by core.session.StimulusScheduler: one entry per (loop, block)
+# with the logged frame numbers where the block started and ended
+# (end exclusive). Stored as markers.json inside a .tses directory or as
+# <name>.markers.json next to a CSV.
+
+MARKERS_NAME = "markers.json"
+
+
+def markers_path(session_path):
+    if os.path.isdir(session_path) or session_path.endswith(SESSION_EXT):
+        return os.path.join(session_path, MARKERS_NAME)
+    return os.path.splitext(session_path)[0] + ".markers.json"
+
+
+def write_markers(session_path, markers):
+    path = markers_path(session_path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(markers, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_markers(session_path):
+    """The markers dict, or None if the session has none."""
+    path = markers_path(session_path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+# -------- CSV conversion --------
+
+def _parse_timestamp(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def csv_to_session(csv_path, session_path=None, chunk_size=4096):
+    """
+    Converts a wide DataLogger CSV into a binary session directory. The
+    session is built next to the target and swapped in when complete, so
+    re-running replaces an existing session instead of appending to it
+    (its stimulus markers are kept).
+    """
+    if session_path is None:
+        session_path = os.path.splitext(csv_path)[0] + SESSION_EXT
+    session_path = session_path.rstrip(os.sep)
+    tmp_path = session_path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+    with open(csv_path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+
+        lm_x = [i for i, name in enumerate(header) if name.startswith("lm_") and name.endswith("_x")]
+        lm_y = [header.index(header[i][:-2] + "_y") for i in lm_x]
+        lm_cols = set(lm_x) | set(lm_y)
+        roi_idx = [
+            i for i, name in enumerate(header)
+            if i not in lm_cols and name not in ("frame", "timestamp")
+        ]
+        frame_i = header.index("frame")
+        ts_i = header.index("timestamp")
+
+        writer = SessionWriter(tmp_path, len(lm_x), [header[i] for i in roi_idx])
+        chunk = []
+
+        def write_chunk():
+            rows = np.array(chunk, dtype=object)
+            writer.append(
+                rows[:, frame_i].astype(np.int64),
+                [_parse_timestamp(v) for v in rows[:, ts_i]],
+                np.stack([rows[:, lm_x].astype(np.int64), rows[:, lm_y].astype(np.int64)], axis=-1),
+                rows[:, roi_idx].astype(np.float64) if roi_idx else np.empty((len(chunk), 0)),
+            )
+
+        for row in reader:
+            if not row:
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                write_chunk()
+                chunk = []
+        if chunk:
+            write_chunk()
+        writer.close()
+
+    if os.path.isdir(session_path):
+        old_markers = os.path.join(session_path, MARKERS_NAME)
+        if os.path.exists(old_markers):
+            shutil.copy2(old_markers, os.path.join(tmp_path, MARKERS_NAME))
+        shutil.rmtree(session_path)
+    os.replace(tmp_path, session_path)
+    return session_path
+
+
+def session_to_csv(session_path, csv_path=None):
+    """Writes a binary session back out in the wide DataLogger CSV layout."""
+    if csv_path is None:
+        csv_path = os.path.splitext(session_path)[0] + ".csv"
+
+    session = SessionReader(session_path)
+    header = ["frame", "timestamp"]
+    for i in range(session.num_landmarks):
+        header += [f"lm_{i}_x", f"lm_{i}_y"]
+    header += session.roi_columns
+
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for k in range(len(session)):
+            ts = datetime.datetime.fromtimestamp(round(float(session.timestamps[k]), 6))
+            row = [int(session.frames[k]), ts.isoformat()]
+            row += session.landmarks[k].ravel().tolist()
+            row += [str(session.roi[name][k]) for name in session.roi_columns]
+            writer.writerow(row)
+
+    return csv_path
+
+
+# -------- Run manually --------
+# python -m core.session_store <file.csv | dir.tses> [output]
+if __name__ == "__main__":
+    import sys
+
+    src = sys.argv[1]
+    dst = sys.argv[2] if len(sys.argv) > 2 else None
+    if is_binary_session(src):
+        print("Wrote", session_to_csv(src, dst))
+    else:
+        print("Wrote", csv_to_session(src, dst))
@@ -0,0 +1,35 @@
+import time
+
+# Imported first thing by main.py, so this is (close to) process start
+T0 = time.perf_counter()
+
+# Time from launch until the home page is on screen
+TIME_TO_FIRST_WINDOW_TARGET = 1.0
+
+_marks = []
+
+
+def mark(label):
+    """Records the time since launch at which `label` happened."""
+    elapsed = time.perf_counter() - T0
+    _marks.append((label, elapsed))
+    return elapsed
+
+
+def elapsed_at(label):
+    for name, elapsed in _marks:
+        if name == label:
+            return elapsed
+    return None
+
+
+def report():
+    lines = ["Startup timing:"]
+    for label, elapsed in _marks:
+        lines.append(f"  {elapsed * 1000:8.1f} ms  {label}")
+    first_window = elapsed_at("first window shown")
+    if first_window is not None:
+        status = "OK" if first_window <= TIME_TO_FIRST_WINDOW_TARGET else "OVER TARGET"
+        lines.append(f"  time to first window {first_window:.2f}s "
+                     f"(target {TIME_TO_FIRST_WINDOW_TARGET:.2f}s): {status}")
+    return "\n".join(lines)
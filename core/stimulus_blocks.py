@@ -0,0 +1,28 @@
+# stimulus_blocks.py
+# --------------------------------
+# Stimulus timing and feature layout shared by the capture side
+# (core.session, core.feature_accumulator) and ml_stage.features.
+# No third-party imports, so the GUI does not load the ML stack.
+# --------------------------------
+
+# Stimulus blocks within ONE loop (seconds)
+STIMULUS_BLOCKS = [
+    ("baseline", 0.0, 3.0),
+    ("structure", 4.0, 5.0),
+    ("velocity", 6.0, 8.0),
+    ("fire", 9.0, 11.0),
+    ("abstract", 12.0, 24.0),
+    ("shock", 25.0, 31.0),
+]
+
+LOOP_DURATION = 31.0  # seconds
+
+
+def feature_names_for(num_loops, rois):
+    return [
+        f"loop{loop_idx+1}_{block_name}_{roi}_{stat}"
+        for loop_idx in range(num_loops)
+        for block_name, _, _ in STIMULUS_BLOCKS
+        for roi in rois
+        for stat in ("mean", "std")
+    ]
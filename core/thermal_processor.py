@@ -17,48 +17,105 @@
 import numpy as np
 import cv2
 
+# Stimulus regions, keyed by name, as lists of 68-landmark indices.
+# Pass a different dict to ThermalProcessor to change the regions.
+DEFAULT_REGIONS = {
+    "nose_tip": [30],            # Landmark 30 is the tip
+    "left_eye": [37, 38, 40, 41], # Periorbital area
+    "right_eye": [43, 44, 46, 47],
+    "forehead": [19, 20, 21, 24]  # Above the brows
+}
+
+
+def summed_area_tables(images):
+    """
+    Summed-area tables of pixel values and squared values.
+    images: (F, h, w) stack of single-channel images.
+    Returns (S, SQ), each (F, h+1, w+1) float64 with a zero first row/column.
+    """
+    if images.dtype not in (np.uint8, np.float32, np.float64):
+        images = images.astype(np.float64)
+    S = np.empty((images.shape[0], images.shape[1] + 1, images.shape[2] + 1))
+    SQ = np.empty_like(S)
+    for i, image in enumerate(images):
+        S[i], SQ[i] = cv2.integral2(image, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+    return S, SQ
+
+
 class ThermalProcessor:
-    def __init__(self):
+    def __init__(self, regions=None, roi_size=5):
         # Define the radius of the "box" around each landmark (e.g., 5x5 pixels)
-        self.roi_size = 5 
+        self.roi_size = roi_size
+        self.set_regions(regions or DEFAULT_REGIONS)
+
+    def set_regions(self, regions):
+        """Builds the flat landmark/region offset tables used by every frame."""
+        self.regions = {name: list(indices) for name, indices in regions.items()}
+        self.region_names = list(self.regions)
+        self._landmark_idx = np.array(
+            [idx for indices in self.regions.values() for idx in indices], dtype=np.intp
+        )
+        self._region_of = np.array(
+            [r for r, indices in enumerate(self.regions.values()) for _ in indices], dtype=np.intp
+        )
+
+    def extract_stimulus_batch(self, frames, landmarks):
+        """
+        frames: (F, H, W[, C]) stack; landmarks: (F, N, 2)
+        Returns {<region>_mean: (F,), <region>_std: (F,)} rounded to 2 decimals.
+        """
+        frames = np.asarray(frames)
+        F, H, W = frames.shape[:3]
+        C = frames.shape[3] if frames.ndim == 4 else 1
+        r = self.roi_size
+
+        # Box corners for every (frame, region landmark), clipped to the frame
+        pts = np.asarray(landmarks)[:, self._landmark_idx].astype(np.intp)
+        x0 = np.clip(pts[..., 0] - r, 0, W)
+        x1 = np.maximum(np.clip(pts[..., 0] + r, 0, W), x0)
+        y0 = np.clip(pts[..., 1] - r, 0, H)
+        y1 = np.maximum(np.clip(pts[..., 1] + r, 0, H), y0)
+        box_n = (x1 - x0) * (y1 - y0) * C
+
+        # Tables only cover the union of the boxes. Channels are interleaved
+        # into columns ((H, W, C) -> (H, W*C)), so a pixel box spans C times
+        # as many columns and no per-channel reduction is needed.
+        cx0, cx1, cy0, cy1 = x0.min(), x1.max(), y0.min(), y1.max()
+        if cx1 > cx0 and cy1 > cy0:
+            crop = frames[:, cy0:cy1, cx0:cx1].reshape(F, cy1 - cy0, (cx1 - cx0) * C)
+            S, SQ = summed_area_tables(crop)
+            bx0, bx1 = (x0 - cx0) * C, (x1 - cx0) * C
+            by0, by1 = y0 - cy0, y1 - cy0
+            f = np.arange(F)[:, None]
+            box_sum = S[f, by1, bx1] - S[f, by0, bx1] - S[f, by1, bx0] + S[f, by0, bx0]
+            box_sq = SQ[f, by1, bx1] - SQ[f, by0, bx1] - SQ[f, by1, bx0] + SQ[f, by0, bx0]
+        else:
+            box_sum = box_sq = np.zeros(box_n.shape)
+
+        # Landmark boxes -> regions (overlapping boxes count twice, like pixels.extend)
+        R = len(self.region_names)
+        keys = (np.arange(F)[:, None] * R + self._region_of[None, :]).ravel()
+        total = np.bincount(keys, weights=box_sum.ravel(), minlength=F * R).reshape(F, R)
+        total_sq = np.bincount(keys, weights=box_sq.ravel(), minlength=F * R).reshape(F, R)
+        count = np.bincount(keys, weights=box_n.ravel(), minlength=F * R).reshape(F, R)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+            var = np.maximum(total_sq / count - mean * mean, 0.0)
+        mean = np.where(count > 0, np.round(mean, 2), 0.0)
+        std = np.where(count > 0, np.round(np.sqrt(var), 2), 0.0)
+
+        results = {}
+        for r, region_name in enumerate(self.region_names):
+            results[f"{region_name}_mean"] = mean[:, r]
+            results[f"{region_name}_std"] = std[:, r]
+        return results
 
     def extract_stimulus_data(self, thermal_frame, landmarks):
         """
         Calculates mean temperature for the key stimulus regions.
         landmarks: np.array of 68 [x, y] coordinates
         """
-        results = {}
-        
-        # Define Stimulus Regions using the 68-landmark indices
-        regions = {
-            "nose_tip": [30],            # Landmark 30 is the tip
-            "left_eye": [37, 38, 40, 41], # Periorbital area
-            "right_eye": [43, 44, 46, 47],
-            "forehead": [19, 20, 21, 24]  # Above the brows
-        }
-
-        for region_name, indices in regions.items():
-            pixels = []
-            for idx in indices:
-                x, y = landmarks[idx]
-                
-                # Create a small box around the landmark
-                x_start = max(0, x - self.roi_size)
-                x_end = min(thermal_frame.shape[1], x + self.roi_size)
-                y_start = max(0, y - self.roi_size)
-                y_end = min(thermal_frame.shape[0], y + self.roi_size)
-                
-                # Extract the thermal pixel values (intensity)
-                roi = thermal_frame[y_start:y_end, x_start:x_end]
-                if roi.size > 0:
-                    pixels.extend(roi.flatten())
-            
-            # Calculate Mean and Standard Deviation for this stimulus point
-            if pixels:
-                results[f"{region_name}_mean"] = round(np.mean(pixels), 2)
-                results[f"{region_name}_std"] = round(np.std(pixels), 2)
-            else:
-                results[f"{region_name}_mean"] = 0
-                results[f"{region_name}_std"] = 0
-
-        return results
\ No newline at end of file
+        batch = self.extract_stimulus_batch(thermal_frame[None], np.asarray(landmarks)[None])
+        return {key: float(values[0]) for key, values in batch.items()}
+
@@ -0,0 +1,236 @@
+import os
+import glob
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+# mode -> (file extension, fourcc); "raw" is a directory of .npy chunks
+RECORDING_MODES = {
+    "xvid": (".avi", "XVID"),       # compact, lossy (the original format)
+    "ffv1": (".mkv", "FFV1"),       # lossless, bit-exact on replay
+    "raw": (".frames", None),       # lossless uncompressed NumPy chunks
+}
+
+# Marker file next to recordings whose frames carry the landmark overlay
+ANNOTATED_EXT = ".annotated"
+
+
+def can_record(mode, dtype):
+    """Whether `mode` can store frames of `dtype` (16-bit needs ffv1 or raw)."""
+    dtype = np.dtype(dtype)
+    if mode == "raw":
+        return True
+    if dtype == np.uint16:
+        return mode == "ffv1"
+    return dtype == np.uint8
+
+
+class VideoRecorder:
+    """
+    Encodes frames on a background thread fed through a bounded queue.
+    The writer is opened with the size of the first frame it receives, so
+    geometry always matches the source. When the encoder falls behind,
+    incoming frames are dropped (and counted) rather than blocking capture.
+
+    Capture timestamps of the written frames are saved next to the video as
+    <base>.timestamps.npy, so analysis-rate recordings can be replayed with
+    their real timing. Recordings with the landmark overlay drawn in are
+    marked by an empty <base>.annotated file, which core.batch_reprocess
+    refuses.
+
+    Raw radiometric frames ((h, w) uint16) are stored losslessly in "ffv1"
+    (16-bit grayscale) and "raw" modes; "xvid" only takes 8-bit BGR.
+    """
+    def __init__(self, base_path, fps=20.0, mode="xvid", max_queue=64, chunk_frames=300, annotated=False):
+        """
+        base_path: output path without extension (the mode adds it)
+        fps: nominal container frame rate (use the camera's actual rate)
+        mode: one of RECORDING_MODES
+        chunk_frames: frames per .npy file in "raw" mode
+        annotated: the frames carry the landmark overlay (not reprocessable)
+        """
+        if mode not in RECORDING_MODES:
+            raise ValueError(f"Unknown recording mode {mode!r}")
+        ext, self.fourcc = RECORDING_MODES[mode]
+        self.mode = mode
+        self.path = base_path + ext
+        self.timestamps_path = base_path + ".timestamps.npy"
+        if annotated:
+            open(base_path + ANNOTATED_EXT, "w").close()
+        self.fps = fps
+        self.chunk_frames = chunk_frames
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.frames_written = 0
+        self.dropped_frames = 0
+        self.error = None               # first encoder error; later frames are discarded
+        self._timestamps = []
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, frame, timestamp=None):
+        """Queues a frame without blocking; the recorder keeps its own reference."""
+        try:
+            self.queue.put_nowait((frame, timestamp))
+        except queue.Full:
+            self.dropped_frames += 1
+
+    def _run(self):
+        writer = None
+        chunk = []
+        chunk_index = 0
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            frame, timestamp = item
+            if self.error is not None:
+                # Keep draining so write() and close() never block on a dead encoder
+                self.dropped_frames += 1
+                continue
+
+            try:
+                if self.mode == "raw":
+                    if writer is None:
+                        os.makedirs(self.path, exist_ok=True)
+                        writer = True
+                    chunk.append(frame)
+                    if len(chunk) >= self.chunk_frames:
+                        self._save_chunk(chunk_index, chunk)
+                        chunk_index += 1
+                        chunk = []
+                else:
+                    if writer is None:
+                        writer = self._open_writer(frame)
+                    writer.write(frame)
+            except Exception as e:
+                self.error = e
+                self.dropped_frames += 1
+                print(f"Video recorder stopped encoding {self.path}: {e}")
+                continue
+
+            self._timestamps.append(np.nan if timestamp is None else timestamp)
+            self.frames_written += 1
+
+        try:
+            if self.mode == "raw":
+                if chunk:
+                    self._save_chunk(chunk_index, chunk)
+            elif writer is not None:
+                writer.release()
+            if self._timestamps:
+                np.save(self.timestamps_path, np.asarray(self._timestamps, dtype=np.float64))
+        except Exception as e:
+            self.error = self.error or e
+            print(f"Video recorder could not finish {self.path}: {e}")
+
+    def _open_writer(self, frame):
+        if not can_record(self.mode, frame.dtype):
+            raise ValueError(f"{self.mode!r} recordings cannot store {frame.dtype} frames; use 'ffv1' or 'raw'")
+        h, w = frame.shape[:2]
+        fourcc = cv2.VideoWriter_fourcc(*self.fourcc)
+        if frame.dtype == np.uint16:
+            writer = cv2.VideoWriter(
+                self.path, cv2.CAP_FFMPEG, fourcc, self.fps, (w, h),
+                [cv2.VIDEOWRITER_PROP_DEPTH, cv2.CV_16U, cv2.VIDEOWRITER_PROP_IS_COLOR, 0]
+            )
+        else:
+            writer = cv2.VideoWriter(self.path, fourcc, self.fps, (w, h))
+        if not writer.isOpened():
+            raise IOError(f"could not open a {self.fourcc} writer for {w}x{h} {frame.dtype} frames")
+        return writer
+
+    def _save_chunk(self, index, frames):
+        np.save(os.path.join(self.path, f"chunk_{index:06d}.npy"), np.stack(frames))
+        if index == 0:
+            with open(os.path.join(self.path, "fps.txt"), "w") as f:
+                f.write(f"{self.fps}\n")
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "frames_written": self.frames_written,
+            "dropped_frames": self.dropped_frames,
+        }
+
+    def close(self, timeout=5.0):
+        """
+        Finishes encoding everything queued and closes the file. Waits at
+        most `timeout` seconds for the queue to accept the end marker and
+        again for the encoder to finish, so a stuck encoder cannot hang
+        the caller.
+        """
+        if self._thread is None:
+            return
+        if self._thread.is_alive():
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                print(f"Video recorder queue for {self.path} did not drain; closing anyway")
+            self._thread.join(timeout)
+        self._thread = None
+
+
+class RawVideoCapture:
+    """
+    Minimal cv2.VideoCapture stand-in for "raw" recordings (read, set/get
+    of frame position, count and fps), so replay code works on either.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.chunks = sorted(glob.glob(os.path.join(path, "chunk_*.npy")))
+        self._lengths = [len(np.load(c, mmap_mode="r")) for c in self.chunks]
+        self._starts = np.cumsum([0] + self._lengths)
+        fps_path = os.path.join(path, "fps.txt")
+        self.fps = float(open(fps_path).read()) if os.path.exists(fps_path) else 0.0
+        self.pos = 0
+        self._loaded = (None, None)     # (chunk index, memmap)
+
+    def isOpened(self):
+        return bool(self.chunks)
+
+    def read(self):
+        if self.pos >= self._starts[-1]:
+            return False, None
+        index = int(np.searchsorted(self._starts, self.pos, side="right") - 1)
+        if self._loaded[0] != index:
+            self._loaded = (index, np.load(self.chunks[index], mmap_mode="r"))
+        frame = np.array(self._loaded[1][self.pos - self._starts[index]])
+        self.pos += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self._starts[-1])
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.pos)
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.pos = int(value)
+            return True
+        return False
+
+    def release(self):
+        self._loaded = (None, None)
+
+
+def open_capture(path):
+    """
+    cv2.VideoCapture for video files, RawVideoCapture for raw recordings.
+    16-bit grayscale videos (radiometric ffv1) are decoded unconverted, as
+    (h, w) uint16 frames.
+    """
+    if os.path.isdir(path):
+        return RawVideoCapture(path)
+    cap = cv2.VideoCapture(path)
+    pixel_format = int(cap.get(cv2.CAP_PROP_CODEC_PIXEL_FORMAT)).to_bytes(4, "little")
+    if pixel_format in (b"Y1\x00\x10", b"Y1\x00\x20"):   # GRAY16 (LE / BE)
+        cap.release()
+        cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_CONVERT_RGB, 0])
+    return cap
@@ -1,40 +1,91 @@
-import sys
-from PyQt6.QtWidgets import QApplication, QMainWindow, QStackedWidget
-
-from ui.home_page import HomePage
-from ui.user_page import UserPage
-from ui.alignment_page import AlignmentPage
-
-
-class MainWindow(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("AI-Based Hiring Assistant")
-        self.setGeometry(100, 100, 1400, 800)
-
-        self.stack = QStackedWidget()
-        self.setCentralWidget(self.stack)
-
-        self.home_page = HomePage(self)
-        self.user_page = UserPage(self)
-        self.alignment_page = AlignmentPage(self)
-
-        self.stack.addWidget(self.home_page)
-        self.stack.addWidget(self.user_page)
-        self.stack.addWidget(self.alignment_page)
-
-        self.stack.setCurrentWidget(self.home_page)
-
-    def go_to_user_page(self):
-        self.stack.setCurrentWidget(self.user_page)
-
-    def go_to_alignment_page(self, user_data, capture_mode):
-        self.alignment_page.set_session(user_data, capture_mode)
-        self.stack.setCurrentWidget(self.alignment_page)
-
-
-
-app = QApplication(sys.argv)
-window = MainWindow()
-window.show()
-sys.exit(app.exec())
+from core import startup  # first: starts the startup clock
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtWidgets import QApplication, QMainWindow, QStackedWidget
+from PyQt6.QtCore import Qt, QTimer
+
+from ui.home_page import HomePage
+from ui.user_page import UserPage
+# ui.alignment_page (mediapipe, OpenCV pipeline, GAN backend) is imported on
+# a background thread once the first window is up; see warm_up().
+
+
+def warm_up():
+    """Background thread: imports the capture stack and loads the models."""
+    from ui import alignment_page
+    startup.mark("alignment modules imported")
+    components = alignment_page.build_components()
+    startup.mark("models ready")
+    return components
+
+
+class MainWindow(QMainWindow):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("AI-Based Hiring Assistant")
+        self.setGeometry(100, 100, 1400, 800)
+
+        self.stack = QStackedWidget()
+        self.setCentralWidget(self.stack)
+
+        self.home_page = HomePage(self)
+        self.user_page = UserPage(self)
+        self.alignment_page = None  # built on first entry, from the warmed-up components
+
+        self.stack.addWidget(self.home_page)
+        self.stack.addWidget(self.user_page)
+
+        self.stack.setCurrentWidget(self.home_page)
+
+        self._warmup_pool = ThreadPoolExecutor(max_workers=1)
+        self.warmup = None
+
+    def start_warm_up(self):
+        self.warmup = self._warmup_pool.submit(warm_up)
+
+    def go_to_user_page(self):
+        self.stack.setCurrentWidget(self.user_page)
+
+    def go_to_alignment_page(self, user_data, capture_mode):
+        first_entry = self.alignment_page is None
+        if first_entry:
+            # Normally finished by now; otherwise wait for the warm-up here
+            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+            try:
+                try:
+                    components = self.warmup.result()
+                except Exception as e:
+                    # Retry here: AlignmentPage builds its own components when given None
+                    print(f"Warm-up failed ({e.__class__.__name__}: {e}); building components now")
+                    components = None
+                from ui.alignment_page import AlignmentPage
+                self.alignment_page = AlignmentPage(self, components)
+                self.stack.addWidget(self.alignment_page)
+            finally:
+                QApplication.restoreOverrideCursor()
+            startup.mark("alignment page built")
+
+        self.alignment_page.set_session(user_data, capture_mode)
+        self.stack.setCurrentWidget(self.alignment_page)
+        if first_entry:
+            startup.mark("camera opened")
+            print(startup.report())
+
+
+def on_first_window():
+    startup.mark("first window shown")
+    window.start_warm_up()
+    print(startup.report())
+
+
+# Guarded: detector worker processes (core.frame_bus) are spawned and
+# re-import this module
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    window = MainWindow()
+    window.show()
+    # Runs once the event loop has painted the first frame
+    QTimer.singleShot(0, on_first_window)
+    sys.exit(app.exec())
@@ -0,0 +1,87 @@
+# bench_features.py
+# --------------------------------
+# Benchmarks extract_features against the original
+# per-(loop, block, roi) mask implementation on synthetic
+# sessions of growing length, and checks that both agree
+#
+#   python -m ml_stage.bench_features      # from the repo root
+# --------------------------------
+
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+from ml_stage.features import extract_features, STIMULUS_BLOCKS, LOOP_DURATION
+
+
+# -------- CONFIGURATION --------
+FPS = 30
+ROIS = ["forehead", "left_eye", "nose_tip", "right_eye"]
+LOOP_COUNTS = [1, 4, 16, 64]
+# --------------------------------
+
+
+def reference_extract_features(df):
+    """The original masking implementation, kept here as the parity baseline."""
+    features = []
+    rois = sorted(df["roi"].unique())
+    num_loops = int(df["timestamp"].max() // LOOP_DURATION) + 1
+
+    for loop_idx in range(num_loops):
+        loop_start = loop_idx * LOOP_DURATION
+        loop_end = loop_start + LOOP_DURATION
+        loop_df = df[(df["timestamp"] >= loop_start) & (df["timestamp"] < loop_end)]
+
+        for block_name, t_start, t_end in STIMULUS_BLOCKS:
+            abs_start = loop_start + t_start
+            abs_end = loop_start + t_end
+            block_df = loop_df[(loop_df["timestamp"] >= abs_start) & (loop_df["timestamp"] <= abs_end)]
+
+            for roi in rois:
+                roi_df = block_df[block_df["roi"] == roi]
+                if roi_df.empty:
+                    features.extend([0.0, 0.0])
+                else:
+                    features.extend([roi_df["mean_temp"].mean(), roi_df["std_temp"].mean()])
+
+    return np.array(features, dtype=float)
+
+
+def synthetic_long_session(num_loops, seed=0):
+    rng = np.random.default_rng(seed)
+    num_frames = int(num_loops * LOOP_DURATION * FPS)
+    timestamps = np.arange(num_frames) / FPS
+    return pd.DataFrame({
+        "timestamp": np.repeat(timestamps, len(ROIS)),
+        "roi": np.tile(ROIS, num_frames),
+        "mean_temp": rng.normal(90, 20, num_frames * len(ROIS)),
+        "std_temp": rng.normal(40, 5, num_frames * len(ROIS)),
+    })
+
+
+def run_benchmark():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"{'loops':>6} {'rows':>9} {'reference (s)':>14} {'vectorized (s)':>15} {'speedup':>8} {'max |diff|':>11}")
+
+        for num_loops in LOOP_COUNTS:
+            df = synthetic_long_session(num_loops)
+            path = os.path.join(tmp_dir, f"bench_{num_loops}.csv")
+            df.to_csv(path, index=False)
+
+            # Both timings include reading the CSV from disk
+            start = time.perf_counter()
+            X_ref = reference_extract_features(pd.read_csv(path))
+            t_ref = time.perf_counter() - start
+
+            start = time.perf_counter()
+            X_new, _ = extract_features(path)
+            t_new = time.perf_counter() - start
+
+            print(f"{num_loops:>6} {len(df):>9} {t_ref:>14.4f} {t_new:>15.4f} "
+                  f"{t_ref / t_new:>7.1f}x {np.max(np.abs(X_ref - X_new)):>11.2e}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -2,37 +2,59 @@
 # --------------------------------
 # Builds training dataset (X_train, Y_train)
 # from session CSVs and questionnaire outputs
+#
+#   python -m ml_stage.build_dataset      # from the repo root
 # --------------------------------
 
 import os
+import time
 import numpy as np
-from features import extract_features
+from concurrent.futures import ProcessPoolExecutor
+from ml_stage.features import extract_features
+from ml_stage.feature_cache import FeatureCache
+from ml_stage.feature_store import FeatureStore, STORE_PATH
 
 
 # -------- CONFIGURATION --------
 SESSION_DIR = "data/sessions"
 QUESTIONNAIRE_DIR = "data/questionnaires"
+CACHE_DIR = "data/feature_cache"
+SESSION_EXTENSIONS = (".tses", ".csv")  # in order of preference
 
 X_OUTPUT_PATH = "X_train.npy"
 Y_OUTPUT_PATH = "Y_train.npy"
+
+NUM_WORKERS = os.cpu_count() or 1   # 1 = extract in this process
+USE_CACHE = True
+WRITE_STORE = True                  # record features + questionnaire scores in the feature store
 # --------------------------------
 
 
-def build_dataset():
+def _timed_extract(session_path):
+    start = time.perf_counter()
+    X, feature_names = extract_features(session_path)
+    return X, feature_names, time.perf_counter() - start
+
+
+def build_dataset(num_workers=NUM_WORKERS, use_cache=USE_CACHE, store_path=STORE_PATH if WRITE_STORE else None):
     X_list = []
     Y_list = []
 
-    session_files = sorted([
-        f for f in os.listdir(SESSION_DIR)
-        if f.endswith(".csv")
-    ])
+    # Wide CSVs and binary .tses sessions are both accepted; a session
+    # logged in both formats is read once, from the .tses
+    session_files = {}
+    listing = os.listdir(SESSION_DIR)
+    for ext in reversed(SESSION_EXTENSIONS):   # preferred formats overwrite
+        for f in listing:
+            if f.endswith(ext):
+                session_files[f[:-len(ext)]] = f
 
     if not session_files:
-        raise RuntimeError("No session CSV files found.")
-
-    for session_file in session_files:
-        session_id = os.path.splitext(session_file)[0]
+        raise RuntimeError("No session files found.")
 
+    # -------- Pair sessions with questionnaires --------
+    sessions = []
+    for session_id, session_file in sorted(session_files.items()):
         session_csv_path = os.path.join(SESSION_DIR, session_file)
         questionnaire_path = os.path.join(
             QUESTIONNAIRE_DIR,
@@ -43,10 +65,42 @@ def build_dataset():
             print(f"[SKIP] No questionnaire for {session_id}")
             continue
 
-        # -------- Extract X --------
-        X, feature_names = extract_features(session_csv_path)
-
-        # -------- Load Y --------
+        sessions.append((session_id, session_csv_path, questionnaire_path))
+
+    # -------- Extract X (cache first, then the pool for misses) --------
+    build_start = time.perf_counter()
+    cache = FeatureCache(CACHE_DIR) if use_cache else None
+    features = {}
+    names = {}
+    timings = {}
+    misses = []
+
+    for session_id, session_csv_path, _ in sessions:
+        start = time.perf_counter()
+        cached = cache.load(session_csv_path) if cache else None
+        if cached is None:
+            misses.append((session_id, session_csv_path))
+        else:
+            features[session_id] = cached[0]
+            names[session_id] = cached[1]
+            timings[session_id] = ("HIT", time.perf_counter() - start)
+
+    if num_workers > 1 and len(misses) > 1:
+        with ProcessPoolExecutor(max_workers=min(num_workers, len(misses))) as pool:
+            results = list(pool.map(_timed_extract, [path for _, path in misses]))
+    else:
+        results = [_timed_extract(path) for _, path in misses]
+
+    for (session_id, session_csv_path), (X, feature_names, elapsed) in zip(misses, results):
+        features[session_id] = X
+        names[session_id] = feature_names
+        timings[session_id] = ("MISS", elapsed)
+        if cache:
+            cache.store(session_csv_path, X, feature_names)
+
+    # -------- Load Y --------
+    store = FeatureStore(store_path) if store_path else None
+    for session_id, session_csv_path, questionnaire_path in sessions:
         Y = np.load(questionnaire_path)
 
         if Y.shape != (5,):
@@ -54,10 +108,17 @@ def build_dataset():
                 f"Invalid questionnaire shape for {session_id}: {Y.shape}"
             )
 
-        X_list.append(X)
+        X_list.append(features[session_id])
         Y_list.append(Y)
+        if store:
+            store.put_session(session_id, features[session_id], names[session_id], source_path=session_csv_path)
+            store.put_scores(session_id, Y, "questionnaire")
+
+        status, elapsed = timings[session_id]
+        print(f"[OK] Added session {session_id} ({status}, {elapsed:.3f}s)")
 
-        print(f"[OK] Added session {session_id}")
+    if store:
+        store.close()
 
     if not X_list:
         raise RuntimeError("No valid sessions found.")
@@ -68,9 +129,12 @@ def build_dataset():
     np.save(X_OUTPUT_PATH, X_train)
     np.save(Y_OUTPUT_PATH, Y_train)
 
+    hits = sum(1 for status, _ in timings.values() if status == "HIT")
     print("\nDataset built successfully")
     print("X_train shape:", X_train.shape)
     print("Y_train shape:", Y_train.shape)
+    print(f"Feature cache: {hits} hits, {len(timings) - hits} misses")
+    print(f"Build time: {time.perf_counter() - build_start:.2f}s ({num_workers} workers)")
     print("Saved to:")
     print(" ", X_OUTPUT_PATH)
     print(" ", Y_OUTPUT_PATH)
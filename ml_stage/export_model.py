@@ -0,0 +1,70 @@
+# export_model.py
+# --------------------------------
+# Exports the trained joblib Pipeline (StandardScaler + MLPRegressor) to a
+# plain .npz weights file for numpy_predictor.NumpyOceanScorer, and checks
+# that both give the same predictions.
+#
+#   python -m ml_stage.export_model [ocean_mlp_model.pkl] [ocean_mlp_weights.npz]
+# --------------------------------
+
+import sys
+import joblib
+import numpy as np
+from ml_stage.numpy_predictor import NumpyOceanScorer
+from ml_stage.predict import OCEAN_TRAITS
+
+
+# -------- CONFIGURATION --------
+MODEL_PATH = "ocean_mlp_model.pkl"
+WEIGHTS_PATH = "ocean_mlp_weights.npz"
+TOLERANCE = 1e-6
+# --------------------------------
+
+
+def export_weights(model_path=MODEL_PATH, weights_path=WEIGHTS_PATH):
+    model = joblib.load(model_path)
+    scaler = model.named_steps["scaler"]
+    mlp = model.named_steps["mlp"]
+
+    n_features = len(mlp.coefs_[0])
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+
+    layers = {}
+    for i, (W, b) in enumerate(zip(mlp.coefs_, mlp.intercepts_)):
+        layers[f"W{i}"] = W
+        layers[f"b{i}"] = b
+
+    np.savez(
+        weights_path,
+        scaler_mean=mean,
+        scaler_scale=scale,
+        n_layers=len(mlp.coefs_),
+        activation=mlp.activation,
+        out_activation=mlp.out_activation_,
+        traits=np.array(OCEAN_TRAITS),
+        **layers
+    )
+    return model, weights_path
+
+
+def check_export(model, weights_path, n_samples=256, seed=0):
+    """Max absolute difference between model.predict and the NumPy scorer."""
+    n_features = model.named_steps["scaler"].n_features_in_
+    scaler = model.named_steps["scaler"]
+    rng = np.random.default_rng(seed)
+    X = rng.normal(scaler.mean_, np.where(scaler.scale_ > 0, scaler.scale_, 1.0), (n_samples, n_features))
+    expected = model.predict(X)
+    actual = NumpyOceanScorer(weights_path).predict(X)
+    return float(np.abs(expected - actual).max())
+
+
+if __name__ == "__main__":
+    model_path = sys.argv[1] if len(sys.argv) > 1 else MODEL_PATH
+    weights_path = sys.argv[2] if len(sys.argv) > 2 else WEIGHTS_PATH
+
+    model, weights_path = export_weights(model_path, weights_path)
+    diff = check_export(model, weights_path)
+    print(f"Exported {model_path} -> {weights_path} (max |diff| {diff:.2e})")
+    if diff > TOLERANCE:
+        sys.exit(f"Export mismatch above tolerance {TOLERANCE}")
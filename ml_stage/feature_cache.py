@@ -0,0 +1,101 @@
+# feature_cache.py
+# --------------------------------
+# On-disk per-session feature cache, one entry per session file (a
+# session's .csv and .tses have separate entries).
+# An entry is valid while the stimulus configuration is unchanged and
+# the session is unchanged (same size+mtime, or failing that, same
+# content hash).
+# --------------------------------
+
+import os
+import json
+import hashlib
+import numpy as np
+
+from ml_stage.features import STIMULUS_BLOCKS, LOOP_DURATION
+from core.session_store import markers_path
+
+
+CACHE_DIR = "data/feature_cache"
+
+
+def config_hash():
+    """Hash of everything in features.py that changes the feature layout."""
+    config = json.dumps({
+        "blocks": STIMULUS_BLOCKS,
+        "loop_duration": LOOP_DURATION,
+    }, sort_keys=True)
+    return hashlib.sha256(config.encode()).hexdigest()[:16]
+
+
+def _session_files(session_path):
+    # A binary .tses session is a directory of column files
+    if os.path.isdir(session_path):
+        return sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(session_path)
+            for name in names
+        )
+    # A CSV's stimulus markers live in a sidecar file
+    sidecar = markers_path(session_path)
+    return [session_path, sidecar] if os.path.exists(sidecar) else [session_path]
+
+
+def session_signature(session_path):
+    """Cheap (size, mtime) signature used before falling back to hashing."""
+    files = _session_files(session_path)
+    stats = [os.stat(f) for f in files]
+    return sum(s.st_size for s in stats), max(s.st_mtime_ns for s in stats)
+
+
+def content_hash(session_path):
+    h = hashlib.sha256()
+    for path in _session_files(session_path):
+        h.update(os.path.relpath(path, session_path).encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+class FeatureCache:
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.config = config_hash()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, session_path):
+        return os.path.join(self.cache_dir, os.path.basename(session_path.rstrip(os.sep)) + ".npz")
+
+    def load(self, session_path):
+        """Returns (X, feature_names) or None on a miss."""
+        entry_path = self._entry_path(session_path)
+        if not os.path.exists(entry_path):
+            return None
+
+        entry = np.load(entry_path, allow_pickle=False)
+        if str(entry["config"]) != self.config:
+            return None
+
+        size, mtime = session_signature(session_path)
+        if (int(entry["size"]), int(entry["mtime"])) != (size, mtime):
+            # Touched but possibly unchanged (e.g. copied): compare content
+            if str(entry["content_hash"]) != content_hash(session_path):
+                return None
+            self.store(session_path, entry["X"], list(entry["feature_names"]))
+
+        return entry["X"], list(entry["feature_names"])
+
+    def store(self, session_path, X, feature_names):
+        size, mtime = session_signature(session_path)
+        tmp_path = self._entry_path(session_path) + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            X=np.asarray(X, dtype=float),
+            feature_names=np.array(feature_names),
+            config=self.config,
+            size=size,
+            mtime=mtime,
+            content_hash=content_hash(session_path),
+        )
+        os.replace(tmp_path, self._entry_path(session_path))
@@ -0,0 +1,262 @@
+# feature_store.py
+# --------------------------------
+# Embedded (SQLite) store of per-session feature vectors and OCEAN scores,
+# written by build_dataset.py and predict.py. Cohort queries and training
+# matrices come straight from here without re-reading session files.
+#
+#   sessions  one row per session: user id, recording time, source path,
+#             config version, feature schema and the vector (float64 blob)
+#   schemas   feature names per schema version (a hash of the names; the
+#             layout depends on session length and ROI set, not only on
+#             the features.py config)
+#   scores    questionnaire and predicted OCEAN scores per session
+#
+#   python -m ml_stage.feature_store query  --since 2026-03-01 --config <version>
+#   python -m ml_stage.feature_store export --since 2026-03-01 [--kind questionnaire]
+# --------------------------------
+
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import argparse
+import datetime
+import numpy as np
+
+from ml_stage.feature_cache import config_hash
+
+
+# -------- CONFIGURATION --------
+STORE_PATH = "data/feature_store.sqlite"
+# --------------------------------
+
+TRAIT_COLUMNS = ["openness", "conscientiousness", "extraversion", "agreeableness", "neuroticism"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS schemas (
+    schema_version TEXT PRIMARY KEY,
+    config_version TEXT NOT NULL,
+    n_features     INTEGER NOT NULL,
+    feature_names  TEXT NOT NULL,
+    created_at     REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id     TEXT PRIMARY KEY,
+    user_id        TEXT,
+    recorded_at    REAL,
+    source_path    TEXT,
+    config_version TEXT NOT NULL,
+    schema_version TEXT NOT NULL REFERENCES schemas(schema_version),
+    features       BLOB NOT NULL,
+    updated_at     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id, recorded_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_date ON sessions(recorded_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_config ON sessions(config_version, recorded_at);
+CREATE TABLE IF NOT EXISTS scores (
+    session_id        TEXT NOT NULL REFERENCES sessions(session_id),
+    kind              TEXT NOT NULL,          -- 'questionnaire' | 'predicted'
+    model             TEXT NOT NULL DEFAULT '',
+    openness          REAL,
+    conscientiousness REAL,
+    extraversion      REAL,
+    agreeableness     REAL,
+    neuroticism       REAL,
+    created_at        REAL NOT NULL,
+    PRIMARY KEY (session_id, kind, model)
+);
+"""
+
+
+def parse_session_id(session_id):
+    """
+    (user_id, recorded_at POSIX seconds) from the naming schemes in use:
+    DataLogger's session_[<user id>_]YYYYmmdd_HHMMSS and recordings'
+    <user id>_<unix time>. Unknown parts are None.
+    """
+    match = re.fullmatch(r"session_(?:(.+)_)?(\d{8}_\d{6})", session_id)
+    if match:
+        return match.group(1), datetime.datetime.strptime(match.group(2), "%Y%m%d_%H%M%S").timestamp()
+    match = re.fullmatch(r"(.+)_(\d{9,})", session_id)
+    if match:
+        return match.group(1), float(match.group(2))
+    return None, None
+
+
+def schema_version(feature_names):
+    return hashlib.sha256("\n".join(feature_names).encode()).hexdigest()[:16]
+
+
+def _to_timestamp(value):
+    """None, POSIX seconds, datetime/date or an ISO string -> POSIX seconds."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    return value.timestamp()
+
+
+class FeatureStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+        self.config = config_hash()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    # -------- Writes --------
+    def put_session(self, session_id, X, feature_names, source_path=None,
+                    user_id=None, recorded_at=None, config_version=None):
+        """Inserts or replaces a session's feature vector (commit() to persist)."""
+        config_version = config_version or self.config
+        parsed_user, parsed_time = parse_session_id(session_id)
+        user_id = user_id if user_id is not None else parsed_user
+        recorded_at = _to_timestamp(recorded_at) if recorded_at is not None else parsed_time
+        if recorded_at is None and source_path and os.path.exists(source_path):
+            recorded_at = os.path.getmtime(source_path)
+
+        feature_names = list(feature_names)
+        schema = schema_version(feature_names)
+        X = np.ascontiguousarray(X, dtype="<f8").ravel()
+        if len(X) != len(feature_names):
+            raise ValueError(f"{session_id}: {len(X)} features but {len(feature_names)} names")
+
+        now = time.time()
+        self.db.execute(
+            "INSERT OR IGNORE INTO schemas VALUES (?, ?, ?, ?, ?)",
+            (schema, config_version, len(feature_names), json.dumps(feature_names), now)
+        )
+        self.db.execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (session_id, user_id, recorded_at, source_path, config_version, schema, X.tobytes(), now)
+        )
+
+    def put_scores(self, session_id, scores, kind, model=""):
+        """scores: 5 values in OCEAN order, or a {trait: value} dict."""
+        if isinstance(scores, dict):
+            scores = list(scores.values())
+        values = [float(v) for v in np.asarray(scores, dtype=float).ravel()]
+        self.db.execute(
+            "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (session_id, kind, model, *values, time.time())
+        )
+
+    def commit(self):
+        self.db.commit()
+
+    # -------- Reads --------
+    def _where(self, user_id=None, since=None, until=None, config_version=None):
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append("s.user_id = ?")
+            params.append(user_id)
+        if config_version is not None:
+            clauses.append("s.config_version = ?")
+            params.append(config_version)
+        if since is not None:
+            clauses.append("s.recorded_at >= ?")
+            params.append(_to_timestamp(since))
+        if until is not None:
+            clauses.append("s.recorded_at < ?")
+            params.append(_to_timestamp(until))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, user_id=None, since=None, until=None, config_version=None):
+        """Session metadata (no feature vectors) matching all given filters, oldest first."""
+        where, params = self._where(user_id, since, until, config_version)
+        rows = self.db.execute(
+            "SELECT s.session_id, s.user_id, s.recorded_at, s.source_path, s.config_version, s.schema_version "
+            f"FROM sessions s{where} ORDER BY s.recorded_at", params
+        )
+        return [dict(row) for row in rows]
+
+    def feature_names(self, schema):
+        row = self.db.execute(
+            "SELECT feature_names FROM schemas WHERE schema_version = ?", (schema,)
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def training_matrices(self, kind="questionnaire", model="", config_version=None,
+                          schema=None, user_id=None, since=None, until=None):
+        """
+        (X, Y, session_ids, feature_names) for sessions that have `kind`
+        scores, from the current config version by default. Rows must share
+        one feature layout: unless `schema` is given, the schema with the
+        most matching sessions is exported.
+        """
+        where, params = self._where(user_id, since, until, config_version or self.config)
+        join = (
+            "FROM sessions s JOIN scores c ON c.session_id = s.session_id "
+            f"AND c.kind = ? AND c.model = ?{where}"
+        )
+        params = [kind, model] + params
+        if schema is None:
+            row = self.db.execute(
+                f"SELECT s.schema_version, COUNT(*) AS n {join} "
+                "GROUP BY s.schema_version ORDER BY n DESC LIMIT 1", params
+            ).fetchone()
+            if row is None:
+                return np.empty((0, 0)), np.empty((0, 5)), [], []
+            schema = row[0]
+
+        rows = self.db.execute(
+            f"SELECT s.session_id, s.features, {', '.join('c.' + t for t in TRAIT_COLUMNS)} "
+            f"{join} AND s.schema_version = ? ORDER BY s.recorded_at, s.session_id",
+            params + [schema]
+        ).fetchall()
+        X = np.vstack([np.frombuffer(row[1], dtype="<f8") for row in rows])
+        Y = np.array([tuple(row)[2:] for row in rows], dtype=float)
+        return X, Y, [row[0] for row in rows], self.feature_names(schema)
+
+
+# -------- Run manually --------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the feature store or export training matrices")
+    parser.add_argument("command", choices=["query", "export"])
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument("--user")
+    parser.add_argument("--since", help="ISO date, e.g. 2026-03-01")
+    parser.add_argument("--until")
+    parser.add_argument("--config", help="config version (default: current features.py config)")
+    parser.add_argument("--kind", default="questionnaire", help="score kind to export as Y")
+    parser.add_argument("--x-out", default="X_train.npy")
+    parser.add_argument("--y-out", default="Y_train.npy")
+    args = parser.parse_args()
+
+    with FeatureStore(args.store) as store:
+        start = time.perf_counter()
+        if args.command == "query":
+            rows = store.query(args.user, args.since, args.until, args.config)
+            elapsed = time.perf_counter() - start
+            for row in rows:
+                when = datetime.datetime.fromtimestamp(row["recorded_at"]) if row["recorded_at"] else "?"
+                print(f"{row['session_id']:<32} {row['user_id'] or '-':<12} {when}  {row['config_version']}")
+            print(f"{len(rows)} sessions in {elapsed * 1000:.1f} ms")
+        else:
+            X, Y, session_ids, _ = store.training_matrices(
+                args.kind, config_version=args.config, user_id=args.user,
+                since=args.since, until=args.until
+            )
+            elapsed = time.perf_counter() - start
+            np.save(args.x_out, X)
+            np.save(args.y_out, Y)
+            print(f"Exported {len(session_ids)} sessions in {elapsed * 1000:.1f} ms")
+            print("X:", X.shape, "->", args.x_out)
+            print("Y:", Y.shape, "->", args.y_out)
@@ -8,18 +8,165 @@
 import pandas as pd
 import numpy as np
 
+from core.session_store import SessionReader, is_binary_session, read_markers
+from core.stimulus_blocks import STIMULUS_BLOCKS, LOOP_DURATION, feature_names_for
 
-# Stimulus blocks within ONE loop (seconds)
-STIMULUS_BLOCKS = [
-    ("baseline", 0.0, 3.0),
-    ("structure", 4.0, 5.0),
-    ("velocity", 6.0, 8.0),
-    ("fire", 9.0, 11.0),
-    ("abstract", 12.0, 24.0),
-    ("shock", 25.0, 31.0),
-]
 
-LOOP_DURATION = 31.0  # seconds
+def _relative_seconds(timestamps):
+    """Numeric timestamps pass through; ISO strings become seconds since the first row."""
+    if pd.api.types.is_numeric_dtype(timestamps):
+        return np.asarray(timestamps, dtype=float)
+    # isoformat() omits the fraction on whole seconds, so rows may mix formats
+    parsed = pd.to_datetime(timestamps, format="ISO8601")
+    return (parsed - parsed.iloc[0]).dt.total_seconds().to_numpy()
+
+
+def _wide_rois(columns):
+    """ROI names from wide per-region columns (<roi>_mean / <roi>_std)."""
+    columns = set(columns)
+    return sorted(
+        name[:-len("_mean")] for name in columns
+        if name.endswith("_mean") and name[:-len("_mean")] + "_std" in columns
+    )
+
+
+def load_session_rows(session_path):
+    """
+    Per-frame arrays of a wide CSV or .tses session:
+        frames, timestamps (seconds since the first row), means (rows, rois), stds (rows, rois), rois
+    Returns None for the long layout, which has no per-frame rows.
+    """
+    if is_binary_session(session_path):
+        session = SessionReader(session_path)
+        timestamps = session.timestamps - (session.timestamps[0] if len(session) else 0.0)
+        rois = _wide_rois(session.roi_columns)
+        means = np.stack([session.roi[f"{r}_mean"] for r in rois], axis=1)
+        stds = np.stack([session.roi[f"{r}_std"] for r in rois], axis=1)
+        return np.asarray(session.frames), np.asarray(timestamps, dtype=float), means, stds, rois
+
+    header = pd.read_csv(session_path, nrows=0).columns
+    if "roi" in header:
+        return None
+
+    rois = _wide_rois(header)
+    frame_col = ["frame"] if "frame" in header else []
+    df = pd.read_csv(
+        session_path,
+        usecols=frame_col + ["timestamp"] + [f"{r}_{stat}" for r in rois for stat in ("mean", "std")]
+    )
+    return (
+        df["frame"].to_numpy() if frame_col else np.arange(1, len(df) + 1),
+        _relative_seconds(df["timestamp"]),
+        df[[f"{r}_mean" for r in rois]].to_numpy(dtype=float),
+        df[[f"{r}_std" for r in rois]].to_numpy(dtype=float),
+        rois
+    )
+
+
+def load_session_columns(session_path):
+    """
+    Loads a session into flat, row-aligned arrays:
+        timestamps (seconds), roi_codes (index into rois), mean_temp, std_temp, rois
+
+    Accepts
+        - the long layout: timestamp, roi, mean_temp, std_temp
+        - the wide DataLogger layout: frame, timestamp, lm_*, <roi>_mean, <roi>_std
+        - a binary .tses session directory (see core/session_store.py), memory-mapped
+    Wide rows are expanded to one entry per ROI.
+    """
+    rows = load_session_rows(session_path)
+    if rows is None:
+        df = pd.read_csv(session_path, usecols=["timestamp", "roi", "mean_temp", "std_temp"])
+        codes, rois = pd.factorize(df["roi"], sort=True)
+        return (
+            _relative_seconds(df["timestamp"]),
+            codes,
+            df["mean_temp"].to_numpy(dtype=float),
+            df["std_temp"].to_numpy(dtype=float),
+            list(rois)
+        )
+    _, timestamps, means, stds, rois = rows
+
+    # Flatten (rows, rois) into one entry per row x roi
+    num_rows, num_rois = means.shape
+    return (
+        np.repeat(np.asarray(timestamps, dtype=float), num_rois),
+        np.tile(np.arange(num_rois), num_rows),
+        np.asarray(means, dtype=float).ravel(),
+        np.asarray(stds, dtype=float).ravel(),
+        rois
+    )
+
+
+def assign_blocks(timestamps, num_loops):
+    """
+    Maps every row to its (loop, block) bins in one pass.
+    Returns (row_indices, bin_ids) with bin_id = loop_idx * len(STIMULUS_BLOCKS) + block_idx.
+    A row appears once per block it falls in (blocks may overlap).
+    """
+    loop_starts = np.arange(num_loops) * LOOP_DURATION
+    row_loop = np.searchsorted(loop_starts, timestamps, side="right") - 1
+    valid = row_loop >= 0
+    row_start = loop_starts[np.clip(row_loop, 0, None)]
+    in_loop = valid & (timestamps < row_start + LOOP_DURATION)
+
+    row_indices = []
+    bin_ids = []
+    for block_idx, (_, t_start, t_end) in enumerate(STIMULUS_BLOCKS):
+        in_block = in_loop & (timestamps >= row_start + t_start) & (timestamps <= row_start + t_end)
+        rows = np.flatnonzero(in_block)
+        row_indices.append(rows)
+        bin_ids.append(row_loop[rows] * len(STIMULUS_BLOCKS) + block_idx)
+
+    return np.concatenate(row_indices), np.concatenate(bin_ids)
+
+
+def _binned_mean(keys, values, size):
+    """Per-key mean ignoring NaN (like pandas); 0.0 for keys with no rows."""
+    total = np.bincount(keys, minlength=size)
+    finite = ~np.isnan(values)
+    sums = np.bincount(keys, weights=np.where(finite, values, 0.0), minlength=size)
+    counts = np.bincount(keys, weights=finite, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, sums / counts, 0.0)
+
+
+def _nan_cumsum(values):
+    """Prefix sums (and finite counts) over rows with a leading zero row, NaN ignored."""
+    finite = ~np.isnan(values)
+    sums = np.zeros((len(values) + 1,) + values.shape[1:])
+    counts = np.zeros_like(sums)
+    np.cumsum(np.where(finite, values, 0.0), axis=0, out=sums[1:])
+    np.cumsum(finite, axis=0, out=counts[1:])
+    return sums, counts
+
+
+def features_from_markers(rows, markers):
+    """
+    Feature vector from scheduler markers: every (loop, block) is the row
+    range [start_frame, end_frame) located once by binary search on the
+    frame column, and averaged in O(1) from prefix sums.
+    Returns (X, feature_names) in the extract_features layout.
+    """
+    frames, _, means, stds, rois = rows
+    num_loops = int(markers["num_loops"])
+    num_blocks = len(STIMULUS_BLOCKS)
+    mean_sums, mean_counts = _nan_cumsum(np.asarray(means, dtype=float))
+    std_sums, std_counts = _nan_cumsum(np.asarray(stds, dtype=float))
+
+    X = np.zeros((num_loops, num_blocks, len(rois), 2))
+    for m in markers["markers"]:
+        loop, block = m["loop"], m["block"]
+        if loop >= num_loops or block >= num_blocks:
+            continue
+        a, b = np.searchsorted(frames, [m["start_frame"], m["end_frame"]], side="left")
+        if b <= a:
+            continue
+        with np.errstate(invalid="ignore", divide="ignore"):
+            X[loop, block, :, 0] = (mean_sums[b] - mean_sums[a]) / (mean_counts[b] - mean_counts[a])
+            X[loop, block, :, 1] = (std_sums[b] - std_sums[a]) / (std_counts[b] - std_counts[a])
+
+    return X.ravel(), feature_names_for(num_loops, rois)
 
 
 def extract_features(session_csv_path):
@@ -30,58 +177,42 @@ def extract_features(session_csv_path):
             roi
             mean_temp
             std_temp
+        or the wide DataLogger CSV (<roi>_mean / <roi>_std columns),
+        or a binary .tses session directory (see core/session_store.py)
+
+        Blocks come from the session's stimulus markers when present
+        (core/session.py), otherwise from fixed offsets from the first row.
 
     Output:
         X: 1D numpy array
         feature_names
     """
 
-    df = pd.read_csv(session_csv_path)
+    # Sessions recorded with the stimulus scheduler carry frame-accurate block markers
+    markers = read_markers(session_csv_path)
+    if markers is not None:
+        rows = load_session_rows(session_csv_path)
+        if rows is not None:
+            return features_from_markers(rows, markers)
 
-    features = []
-    feature_names = []
-
-    rois = sorted(df["roi"].unique())
+    timestamps, roi_codes, mean_temp, std_temp, rois = load_session_columns(session_csv_path)
 
     # Determine how many loops exist
-    num_loops = int(df["timestamp"].max() // LOOP_DURATION) + 1
-
-    for loop_idx in range(num_loops):
-        loop_start = loop_idx * LOOP_DURATION
-        loop_end = loop_start + LOOP_DURATION
-
-        loop_df = df[
-            (df["timestamp"] >= loop_start) &
-            (df["timestamp"] < loop_end)
-        ]
-
-        for block_name, t_start, t_end in STIMULUS_BLOCKS:
-            abs_start = loop_start + t_start
-            abs_end = loop_start + t_end
-
-            block_df = loop_df[
-                (loop_df["timestamp"] >= abs_start) &
-                (loop_df["timestamp"] <= abs_end)
-            ]
-
-            for roi in rois:
-                roi_df = block_df[block_df["roi"] == roi]
-
-                if roi_df.empty:
-                    mean_val = 0.0
-                    std_val = 0.0
-                else:
-                    mean_val = roi_df["mean_temp"].mean()
-                    std_val = roi_df["std_temp"].mean()
-
-                features.extend([mean_val, std_val])
-                feature_names.extend([
-                    f"loop{loop_idx+1}_{block_name}_{roi}_mean",
-                    f"loop{loop_idx+1}_{block_name}_{roi}_std"
-                ])
-
-    X = np.array(features, dtype=float)
-    return X, feature_names
+    num_loops = int(np.nanmax(timestamps) // LOOP_DURATION) + 1
+    num_bins = num_loops * len(STIMULUS_BLOCKS)
+
+    # Bin every row once, then reduce all (loop, block, roi) groups together
+    rows, bins = assign_blocks(timestamps, num_loops)
+    keep = roi_codes[rows] >= 0
+    rows, bins = rows[keep], bins[keep]
+    keys = bins * len(rois) + roi_codes[rows]
+    size = num_bins * len(rois)
+
+    X = np.empty((size, 2), dtype=float)
+    X[:, 0] = _binned_mean(keys, mean_temp[rows], size)
+    X[:, 1] = _binned_mean(keys, std_temp[rows], size)
+
+    return X.ravel(), feature_names_for(num_loops, rois)
 
 
 # Sanity test
@@ -1,22 +1,41 @@
 # model.py
 # --------------------------------
 # Multi-output MLP Regressor for OCEAN prediction
+#
+#   python -m ml_stage.model            # fixed architecture (train_model)
+#   python -m ml_stage.model search     # cross-validated hyperparameter search on all cores
 # --------------------------------
 
+import sys
+import time
 import numpy as np
 import joblib
 from sklearn.neural_network import MLPRegressor
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
+from sklearn.model_selection import GridSearchCV, KFold
+from sklearn.metrics import make_scorer, r2_score
+from ml_stage.predict import OCEAN_TRAITS
 
 
-def train_model(X_train, Y_train, model_path="ocean_mlp_model.pkl"):
-    """
-    X_train: (n_samples, n_features)
-    Y_train: (n_samples, 5)
-    """
+# -------- CONFIGURATION --------
+X_PATH = "X_train.npy"
+Y_PATH = "Y_train.npy"
+MODEL_PATH = "ocean_mlp_model.pkl"
+
+CV_FOLDS = 5
+N_JOBS = -1                 # -1 = all cores
+
+PARAM_GRID = {
+    "mlp__hidden_layer_sizes": [(16,), (32,), (64,), (32, 16), (64, 32)],
+    "mlp__alpha": [1e-4, 1e-3, 1e-2, 1e-1],
+    "mlp__early_stopping": [False, True],
+}
+# --------------------------------
+
 
-    model = Pipeline([
+def make_pipeline():
+    return Pipeline([
         ("scaler", StandardScaler()),
         ("mlp", MLPRegressor(
             hidden_layer_sizes=(16,),
@@ -27,14 +46,80 @@ def train_model(X_train, Y_train, model_path="ocean_mlp_model.pkl"):
         ))
     ])
 
+
+def load_training_data(x_path=X_PATH, y_path=Y_PATH):
+    """
+    Memory-maps the dataset. joblib passes np.memmap arguments to worker
+    processes by file reference, so every CV worker shares one copy.
+    """
+    return np.load(x_path, mmap_mode="r"), np.load(y_path, mmap_mode="r")
+
+
+def train_model(X_train, Y_train, model_path=MODEL_PATH):
+    """
+    X_train: (n_samples, n_features)
+    Y_train: (n_samples, 5)
+    """
+
+    model = make_pipeline()
+
     model.fit(X_train, Y_train)
     joblib.dump(model, model_path)
 
     print("MLP model saved to", model_path)
 
 
+def _trait_r2(y_true, y_pred, index):
+    return r2_score(y_true[:, index], y_pred[:, index])
+
+
+def search_model(X_train, Y_train, model_path=MODEL_PATH, param_grid=PARAM_GRID,
+                 cv=CV_FOLDS, n_jobs=N_JOBS):
+    """
+    Grid search over architecture / regularisation / early stopping with
+    K-fold CV, parallel across candidates and folds. The best pipeline
+    (refit on all data) is saved in the same format as train_model.
+    Returns the fitted GridSearchCV.
+    """
+    scoring = {"r2": "r2"}
+    for i, trait in enumerate(OCEAN_TRAITS):
+        scoring[trait] = make_scorer(_trait_r2, index=i)
+
+    search = GridSearchCV(
+        make_pipeline(),
+        param_grid,
+        scoring=scoring,
+        refit="r2",
+        cv=KFold(n_splits=cv, shuffle=True, random_state=42),
+        n_jobs=n_jobs,
+        error_score=np.nan,
+    )
+
+    start = time.perf_counter()
+    search.fit(X_train, Y_train)
+    elapsed = time.perf_counter() - start
+
+    joblib.dump(search.best_estimator_, model_path)
+
+    results = search.cv_results_
+    best = search.best_index_
+    n_candidates = len(results["params"])
+    print(f"Searched {n_candidates} candidates x {cv} folds in {elapsed:.1f}s")
+    print("Best params:", search.best_params_)
+    print(f"Mean R2: {results['mean_test_r2'][best]:.3f} ± {results['std_test_r2'][best]:.3f}")
+    for trait in OCEAN_TRAITS:
+        print(f"  {trait:<18} R2 {results[f'mean_test_{trait}'][best]:.3f} "
+              f"± {results[f'std_test_{trait}'][best]:.3f}")
+    print("MLP model saved to", model_path)
+    return search
+
+
 if __name__ == "__main__":
-    X_train = np.load("X_train.npy")
-    Y_train = np.load("Y_train.npy")
+    if len(sys.argv) > 1 and sys.argv[1] == "search":
+        X_train, Y_train = load_training_data()
+        search_model(X_train, Y_train)
+    else:
+        X_train = np.load(X_PATH)
+        Y_train = np.load(Y_PATH)
 
-    train_model(X_train, Y_train)
+        train_model(X_train, Y_train)
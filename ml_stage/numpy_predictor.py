@@ -0,0 +1,66 @@
+# numpy_predictor.py
+# --------------------------------
+# NumPy-only OCEAN scorer for a pipeline exported with export_model.py
+# (StandardScaler + MLPRegressor). No scikit-learn / joblib / pandas
+# import, so it loads in milliseconds inside the capture app and workers.
+#
+#   scorer = NumpyOceanScorer("ocean_mlp_weights.npz")
+#   scorer.score_features(X)     # same interface as predict.OceanScorer
+# --------------------------------
+
+import numpy as np
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _logistic(x):
+    np.negative(x, out=x)
+    np.exp(x, out=x)
+    x += 1
+    return np.reciprocal(x, out=x)
+
+
+ACTIVATIONS = {
+    "identity": lambda x: x,
+    "relu": _relu,
+    "tanh": lambda x: np.tanh(x, out=x),
+    "logistic": _logistic,
+}
+
+
+class NumpyOceanScorer:
+    def __init__(self, weights_path="ocean_mlp_weights.npz"):
+        self.weights_path = weights_path
+        with np.load(weights_path) as data:
+            mean = data["scaler_mean"]
+            scale = data["scaler_scale"]
+            n_layers = int(data["n_layers"])
+            weights = [data[f"W{i}"] for i in range(n_layers)]
+            biases = [data[f"b{i}"] for i in range(n_layers)]
+            self.activation = ACTIVATIONS[str(data["activation"])]
+            self.out_activation = ACTIVATIONS[str(data["out_activation"])]
+            self.traits = [str(t) for t in data["traits"]]
+
+        # Fold the scaler into the first layer: ((x - m) / s) @ W + b
+        #   = x @ (W / s[:, None]) + (b - (m / s) @ W)
+        self.weights = [weights[0] / scale[:, None]] + weights[1:]
+        self.biases = [biases[0] - (mean / scale) @ weights[0]] + biases[1:]
+
+    def predict(self, X):
+        """X: (n_samples, n_features) -> (n_samples, n_traits)"""
+        h = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        last = len(self.weights) - 1
+        for i, (W, b) in enumerate(zip(self.weights, self.biases)):
+            h = h @ W
+            h += b
+            h = self.out_activation(h) if i == last else self.activation(h)
+        return h
+
+    def score_features(self, X):
+        """X: (n_sessions, n_features) -> list of OCEAN dicts"""
+        return [
+            {trait: float(value) for trait, value in zip(self.traits, row)}
+            for row in self.predict(X)
+        ]
@@ -1,29 +1,75 @@
 # predict.py
 # --------------------------------
 # Predict OCEAN scores for a new session
+#
+#   python -m ml_stage.predict      # from the repo root
 # --------------------------------
 
+import os
 import joblib
-from features import extract_features
+import numpy as np
+from ml_stage.features import extract_features
+from ml_stage.feature_store import FeatureStore, STORE_PATH
 
 
-def predict_personality(session_csv, model_path="ocean_mlp_model.pkl"):
-    model = joblib.load(model_path)
+OCEAN_TRAITS = [
+    "Openness",
+    "Conscientiousness",
+    "Extraversion",
+    "Agreeableness",
+    "Neuroticism",
+]
 
-    X, feature_names = extract_features(session_csv)
-    X = X.reshape(1, -1)
 
-    prediction = model.predict(X)[0]
+def to_ocean(prediction):
+    return {trait: float(value) for trait, value in zip(OCEAN_TRAITS, prediction)}
 
-    ocean = {
-        "Openness": prediction[0],
-        "Conscientiousness": prediction[1],
-        "Extraversion": prediction[2],
-        "Agreeableness": prediction[3],
-        "Neuroticism": prediction[4]
-    }
 
-    return ocean
+class OceanScorer:
+    """
+    Loads the trained pipeline once and scores many sessions per call.
+    Keep one instance alive for a whole backlog instead of calling
+    predict_personality per session.
+    """
+    def __init__(self, model_path="ocean_mlp_model.pkl"):
+        self.model_path = model_path
+        self.model = joblib.load(model_path)
+
+    def score_features(self, X):
+        """X: (n_sessions, n_features) -> list of OCEAN dicts"""
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        return [to_ocean(row) for row in self.model.predict(X)]
+
+    def score_sessions(self, session_paths, store=None):
+        """store: optional FeatureStore that receives the features and predictions"""
+        extracted = [extract_features(path) for path in session_paths]
+        results = self.score_features(np.vstack([X for X, _ in extracted]))
+        if store is not None:
+            model = os.path.basename(self.model_path)
+            for path, (X, feature_names), ocean in zip(session_paths, extracted, results):
+                session_id = os.path.splitext(os.path.basename(path.rstrip(os.sep)))[0]
+                store.put_session(session_id, X, feature_names, source_path=path)
+                store.put_scores(session_id, ocean, "predicted", model)
+            store.commit()
+        return results
+
+
+_scorers = {}
+
+
+def get_scorer(model_path="ocean_mlp_model.pkl"):
+    """Process-wide scorer, loaded on first use."""
+    if model_path not in _scorers:
+        _scorers[model_path] = OceanScorer(model_path)
+    return _scorers[model_path]
+
+
+def predict_personality(session_csv, model_path="ocean_mlp_model.pkl", store_path=STORE_PATH):
+    """store_path: feature store to record the prediction in (None to skip)"""
+    if store_path is None:
+        return get_scorer(model_path).score_sessions([session_csv])[0]
+    with FeatureStore(store_path) as store:
+        return get_scorer(model_path).score_sessions([session_csv], store)[0]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,224 @@
+# predict_server.py
+# --------------------------------
+# Local OCEAN scoring server (localhost HTTP)
+# Loads the model once and micro-batches concurrent requests
+#
+#   python -m ml_stage.predict_server            # serve on 127.0.0.1:8765
+#   python -m ml_stage.predict_server bench      # fire concurrent requests at it
+#
+#   POST /score  {"features": [[...], ...]}  or  {"sessions": ["path.csv", ...]}
+#   GET  /stats  throughput and p50/p99 latency
+# --------------------------------
+
+import sys
+import json
+import time
+import queue
+import threading
+import urllib.request
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+from ml_stage.features import extract_features
+from ml_stage.predict import OceanScorer
+
+
+# -------- CONFIGURATION --------
+HOST = "127.0.0.1"
+PORT = 8765
+MODEL_PATH = "ocean_mlp_model.pkl"
+
+MAX_BATCH = 64          # rows per model.predict call
+MAX_WAIT = 0.005        # seconds to wait for more requests before scoring
+# --------------------------------
+
+
+class MicroBatcher:
+    """
+    Collects feature rows from concurrent callers and scores them together
+    in one model.predict call.
+    """
+    def __init__(self, scorer, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.scorer = scorer
+        # Expected row width, so malformed requests never reach a shared batch
+        self.n_features = getattr(getattr(scorer, "model", None), "n_features_in_", None)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.latencies = deque(maxlen=10000)
+        self.requests_served = 0
+        self.rows_scored = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, X):
+        """
+        X: (n, n_features). Returns a Future resolving to a list of OCEAN
+        dicts; a malformed X fails its own future without being queued.
+        """
+        future = Future()
+        try:
+            X = np.atleast_2d(np.asarray(X, dtype=float))
+            if X.ndim != 2 or len(X) == 0:
+                raise ValueError(f"expected a (n, n_features) matrix, got shape {X.shape}")
+            if self.n_features is not None and X.shape[1] != self.n_features:
+                raise ValueError(f"expected {self.n_features} features per row, got {X.shape[1]}")
+        except (TypeError, ValueError) as e:
+            future.set_exception(e)
+            return future
+        self.queue.put((X, future, time.perf_counter()))
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self.queue.get()]
+            rows = len(pending[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while rows < self.max_batch:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                pending.append(item)
+                rows += len(item[0])
+            try:
+                self._score(pending)
+            except Exception as e:
+                pending[0][1].set_exception(e)
+
+    def _score(self, pending):
+        try:
+            results = self.scorer.score_features(np.vstack([X for X, _, _ in pending]))
+        except Exception:
+            if len(pending) == 1:
+                raise
+            # Score each request on its own so only the bad one fails
+            for item in pending:
+                try:
+                    self._score([item])
+                except Exception as e:
+                    item[1].set_exception(e)
+            return
+
+        done = time.perf_counter()
+        offset = 0
+        with self._lock:
+            for X, future, submitted in pending:
+                future.set_result(results[offset:offset + len(X)])
+                offset += len(X)
+                self.latencies.append(done - submitted)
+            self.requests_served += len(pending)
+            self.rows_scored += offset
+            self.batches += 1
+
+    def stats(self):
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000
+            elapsed = time.perf_counter() - self.started
+            return {
+                "requests": self.requests_served,
+                "rows": self.rows_scored,
+                "batches": self.batches,
+                "rows_per_sec": self.rows_scored / elapsed if elapsed > 0 else 0.0,
+                "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+                "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+            }
+
+
+class ScoreServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128    # the default of 5 drops connections under concurrent load
+
+
+def make_handler(batcher):
+    class ScoreHandler(BaseHTTPRequestHandler):
+        def _reply(self, code, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._reply(200, batcher.stats())
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/score":
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if "sessions" in request:
+                    X = np.vstack([extract_features(path)[0] for path in request["sessions"]])
+                else:
+                    X = request["features"]
+                self._reply(200, {"ocean": batcher.submit(X).result()})
+            except Exception as e:
+                self._reply(400, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            pass  # keep the console quiet under load
+
+    return ScoreHandler
+
+
+def serve(host=HOST, port=PORT, model_path=MODEL_PATH):
+    batcher = MicroBatcher(OceanScorer(model_path))
+    server = ScoreServer((host, port), make_handler(batcher))
+    print(f"Scoring server on http://{host}:{port} (model: {model_path})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(batcher.stats(), indent=2))
+
+
+def score_remote(X, host=HOST, port=PORT):
+    """Client helper: scores a feature matrix against a running server."""
+    body = json.dumps({"features": np.atleast_2d(X).tolist()}).encode()
+    request = urllib.request.Request(
+        f"http://{host}:{port}/score", data=body,
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())["ocean"]
+
+
+def benchmark(num_requests=2000, concurrency=16, host=HOST, port=PORT):
+    """Fires single-row requests concurrently and prints client-side latency."""
+    with urllib.request.urlopen(f"http://{host}:{port}/stats"):
+        pass
+    X = np.load("X_train.npy")
+
+    def one(i):
+        start = time.perf_counter()
+        score_remote(X[i % len(X)], host, port)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = np.array(list(pool.map(one, range(num_requests)))) * 1000
+    elapsed = time.perf_counter() - start
+
+    print(f"{num_requests} requests, concurrency {concurrency}")
+    print(f"Throughput: {num_requests / elapsed:.1f} req/s")
+    print(f"Latency p50: {np.percentile(latencies, 50):.2f} ms  p99: {np.percentile(latencies, 99):.2f} ms")
+    with urllib.request.urlopen(f"http://{host}:{port}/stats") as response:
+        print("Server:", json.loads(response.read()))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        benchmark()
+    else:
+        serve()
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from core.thermal_processor import ThermalProcessor, DEFAULT_REGIONS
+
+
+def reference_stimulus_data(thermal_frame, landmarks, regions=DEFAULT_REGIONS, roi_size=5):
+    """The original per-landmark loop, kept as the parity baseline."""
+    results = {}
+    for region_name, indices in regions.items():
+        pixels = []
+        for idx in indices:
+            x, y = landmarks[idx]
+            x_start = max(0, x - roi_size)
+            x_end = min(thermal_frame.shape[1], x + roi_size)
+            y_start = max(0, y - roi_size)
+            y_end = min(thermal_frame.shape[0], y + roi_size)
+            roi = thermal_frame[y_start:y_end, x_start:x_end]
+            if roi.size > 0:
+                pixels.extend(roi.flatten())
+        if pixels:
+            results[f"{region_name}_mean"] = round(np.mean(pixels), 2)
+            results[f"{region_name}_std"] = round(np.std(pixels), 2)
+        else:
+            results[f"{region_name}_mean"] = 0
+            results[f"{region_name}_std"] = 0
+    return results
+
+
+@pytest.fixture
+def frames_and_landmarks():
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 256, size=(50, 192, 256, 3), dtype=np.uint8)
+    # Includes points near, on and beyond the frame edges
+    landmarks = rng.integers(-3, 260, size=(50, 69, 2))
+    landmarks[..., 1] = np.clip(landmarks[..., 1], -3, 195)
+    return frames, landmarks
+
+
+@pytest.mark.parametrize("channels", [3, 1])
+def test_matches_reference_loop(frames_and_landmarks, channels):
+    frames, landmarks = frames_and_landmarks
+    if channels == 1:
+        frames = frames[..., 0]
+    processor = ThermalProcessor()
+    for frame, lms in zip(frames, landmarks):
+        fast = processor.extract_stimulus_data(frame, lms)
+        slow = reference_stimulus_data(frame, lms)
+        assert fast.keys() == slow.keys()
+        for key in slow:
+            assert fast[key] == pytest.approx(slow[key], abs=1e-9), key
+
+
+def test_batch_matches_single_frame(frames_and_landmarks):
+    frames, landmarks = frames_and_landmarks
+    processor = ThermalProcessor()
+    batch = processor.extract_stimulus_batch(frames, landmarks)
+    for i in range(len(frames)):
+        single = processor.extract_stimulus_data(frames[i], landmarks[i])
+        for key, values in batch.items():
+            assert values[i] == single[key], (i, key)
+
+
+def test_boxes_outside_the_frame_are_zero():
+    processor = ThermalProcessor()
+    frame = np.full((20, 20), 100, dtype=np.uint8)
+    landmarks = np.full((69, 2), -50)
+    data = processor.extract_stimulus_data(frame, landmarks)
+    assert data == reference_stimulus_data(frame, landmarks)
+    assert all(value == 0 for value in data.values())
@@ -6,7 +6,7 @@ from PyQt6.QtWidgets import (
     QWidget, QLabel, QPushButton,
     QHBoxLayout, QVBoxLayout, QFrame
 )
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtCore import Qt, QTimer, QObject, pyqtSignal
 from PyQt6.QtGui import QImage, QPixmap
 
 # --- CORE LOGIC IMPORTS ---
@@ -16,18 +16,104 @@ from core.alignment_logic import AlignmentLogic
 from core.thermal_processor import ThermalProcessor
 from core.data_logger import DataLogger
 from core.gan_validator import GANValidator 
+from core.frame_pipeline import FrameAnalyzer, FramePipeline
+from core.frame_bus import ProcessFramePipeline
+from core.metrics import PipelineMetrics, MetricsServer
+from core.video_recorder import VideoRecorder, can_record
+from core.session import StimulusScheduler
+from core.radiometric import RadiometricConverter, SyntheticY16Source
+
+# -------- CONFIGURATION --------
+# Run detection / validation / logging on a worker thread instead of the
+# GUI thread. Set to False to fall back to the single-threaded path.
+THREADED_PIPELINE = True
+
+# Run detection, thermal mapping and ROI extraction in this many worker
+# processes fed from a shared-memory frame bus (core.frame_bus), so they
+# use more than one core. 0 keeps them in this process.
+DETECTOR_PROCESSES = 0
+
+# Full face detection only every KEYFRAME_INTERVAL frames (or when optical
+# flow loses the face); landmarks are tracked in between.
+LANDMARK_TRACKING = True
+KEYFRAME_INTERVAL = 10
+
+# Asynchronous MediaPipe LIVE_STREAM detection: frames are submitted without
+# waiting and the most recent finished result is drawn (replaces tracking).
+LIVE_STREAM_DETECTION = False
+
+# Camera preview refresh cap, independent of the analysis rate
+PREVIEW_MAX_FPS = 15
+
+# Live metrics: on-screen overlay under the status line, a JSON-lines
+# snapshot file next to each session log, and a Prometheus /metrics
+# endpoint on localhost (None disables the endpoint).
+SHOW_METRICS_OVERLAY = False
+METRICS_FILE_INTERVAL = 5.0
+METRICS_PORT = 9108
+
+# Session video: "xvid" (compact, lossy), "ffv1" (lossless .mkv) or "raw"
+# (lossless .npy chunks); either lossless mode replays bit-exactly through
+# core.batch_reprocess. RECORD_CLEAN_FRAMES records frames without the
+# landmark overlay; annotated recordings are for viewing only and
+# core.batch_reprocess skips them.
+RECORDING_MODE = "xvid"
+RECORD_CLEAN_FRAMES = True
+
+# Radiometric capture: read the sensor's raw 16-bit (Y16) stream and log
+# stimulus temperatures in °C (core.radiometric) instead of 8-bit pixel
+# values. Clean recordings then hold the raw counts (use "ffv1" or "raw").
+# SYNTHETIC_Y16 replaces the camera with a simulated radiometric sensor.
+RADIOMETRIC_CAPTURE = False
+SYNTHETIC_Y16 = False
+# --------------------------------
+
+
+def build_components():
+    """
+    Creates and warms up the heavy, Qt-free pipeline objects (MediaPipe
+    FaceLandmarker, GAN backend). Safe to call on a background thread so the
+    models load while the operator fills in the earlier pages.
+    """
+    validator = GANValidator()
+    validator.warm_up()
+    return {
+        "detector": LandmarkDetector(
+            tracking=LANDMARK_TRACKING,
+            keyframe_interval=KEYFRAME_INTERVAL,
+            live_stream=LIVE_STREAM_DETECTION
+        ),
+        "aligner": AlignmentLogic(),
+        "processor": ThermalProcessor(),
+        "validator": validator,
+    }
+
+
+class PipelineBridge(QObject):
+    # Carries worker results back to the GUI thread (queued connection)
+    result_ready = pyqtSignal(object)
+
 
 class AlignmentPage(QWidget):
-    def __init__(self, main_window):
+    def __init__(self, main_window, components=None):
+        """components: prebuilt result of build_components() (built here if None)"""
         super().__init__()
         self.main_window = main_window
 
         # ---------- CORE LOGIC INSTANCES ----------
-        self.detector = LandmarkDetector()
-        self.aligner = AlignmentLogic()
-        self.processor = ThermalProcessor()
-        self.logger = DataLogger()
-        self.validator = GANValidator() 
+        components = components or build_components()
+        self.detector = components["detector"]
+        self.aligner = components["aligner"]
+        self.processor = components["processor"]
+        self.validator = components["validator"]
+        self.metrics = PipelineMetrics()
+        self.logger = self.new_logger()
+        self.analyzer = FrameAnalyzer(self.detector, self.aligner, self.validator, self.processor, self.logger, self.metrics)
+        self.analyzer.record_clean = RECORD_CLEAN_FRAMES
+        self.scheduler = StimulusScheduler()
+        self.analyzer.scheduler = self.scheduler
+        if RADIOMETRIC_CAPTURE:
+            self.analyzer.radiometric = RadiometricConverter()
 
         # ---------- STATE ----------
         self.video_writer = None  # FIX: Initialize before any method calls reset_state
@@ -39,11 +125,51 @@ class AlignmentPage(QWidget):
         self.required_stable_frames = 18
         self.frame_counter = 0
 
+        # ---------- PREVIEW ----------
+        self._preview_sizes = {}    # (label w, h, frame w, h) -> scaled (w, h)
+        self._last_preview = 0.0
+
         # ---------- CAMERA & TIMER ----------
-        self.camera = CameraManager()
+        self.camera = None          # opened in set_session, when the page is entered
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_frame)
 
+        # ---------- WORKER PIPELINE ----------
+        self.pipeline = None
+        if DETECTOR_PROCESSES > 0 or THREADED_PIPELINE:
+            self.bridge = PipelineBridge()
+            self.bridge.result_ready.connect(self.handle_result)
+        if DETECTOR_PROCESSES > 0:
+            # Workers start with the first frame and shut down on every reset
+            self.pipeline = ProcessFramePipeline(
+                self.analyzer,
+                self.bridge.result_ready.emit,
+                num_workers=DETECTOR_PROCESSES,
+                prepare=self.prepare_display
+            )
+        elif THREADED_PIPELINE:
+            self.pipeline = FramePipeline(
+                self.analyzer,
+                self.bridge.result_ready.emit,
+                prepare=self.prepare_display
+            )
+            self.pipeline.start()
+
+        # ---------- METRICS ----------
+        self.metrics.add_gauge("camera_dropped_frames", lambda: self.camera.dropped_frames if self.camera else 0)
+        self.metrics.add_gauge("pipeline_dropped_frames", lambda: self.pipeline.dropped_frames if self.pipeline else 0)
+        self.metrics.add_gauge("validator_dropped_frames", lambda: self.validator.dropped)
+        self.metrics.add_gauge("validator_failed_frames", lambda: self.validator.failures)
+        self.metrics.add_gauge("detector_calls_per_sec", self.detector.detector_rate)
+        self.metrics.add_gauge("logger_queue_depth", lambda: self.logger.queue.qsize())
+        self.metrics.add_gauge("recorder_dropped_frames", lambda: self.video_writer.dropped_frames if self.video_writer else 0)
+        self.metrics_server = None
+        if METRICS_PORT is not None:
+            try:
+                self.metrics_server = MetricsServer(self.metrics, port=METRICS_PORT).start()
+            except OSError as e:
+                print(f"Metrics endpoint disabled: {e}")
+
         # ---------- UI LAYOUT ----------
         main = QHBoxLayout(self)
         main.setContentsMargins(20, 20, 20, 20)
@@ -87,9 +213,22 @@ class AlignmentPage(QWidget):
         self.instruction_card.setWordWrap(True)
         self.instruction_card.setStyleSheet("background:#020617; color:white; padding:18px; border-left:5px solid #3b82f6; border-radius:12px; font-size:15px;")
 
+        self.stimulus_label = QLabel()
+        self.stimulus_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.stimulus_label.setStyleSheet("background:#020617; color:#f59e0b; padding:14px; border-radius:12px; font-size:18px; font-weight:bold;")
+        self.stimulus_label.setVisible(False)
+
         self.status_label = QLabel("● Idle")
         self.status_label.setStyleSheet("color:#64748b; font-size:14px;")
 
+        self.metrics_label = QLabel()
+        self.metrics_label.setStyleSheet("color:#64748b; font-family:monospace; font-size:11px;")
+        self.metrics_label.setVisible(SHOW_METRICS_OVERLAY)
+        self.metrics_timer = QTimer()
+        self.metrics_timer.timeout.connect(lambda: self.metrics_label.setText(self.metrics.overlay_text()))
+        if SHOW_METRICS_OVERLAY:
+            self.metrics_timer.start(500)
+
         self.start_btn = QPushButton("Start Recording")
         self.pause_btn = QPushButton("Pause")
         self.stop_btn = QPushButton("Stop")
@@ -113,7 +252,9 @@ class AlignmentPage(QWidget):
 
         panel.addWidget(self.session_card)
         panel.addWidget(self.instruction_card)
+        panel.addWidget(self.stimulus_label)
         panel.addWidget(self.status_label)
+        panel.addWidget(self.metrics_label)
         panel.addSpacing(8)
         panel.addWidget(self.start_btn)
         panel.addWidget(self.pause_btn)
@@ -129,97 +270,176 @@ class AlignmentPage(QWidget):
         self.capture_mode = capture_mode.upper()
         self.session_card.setText(f"<b>Applicant:</b> {user_data['name']}<br><b>User ID:</b> {user_data['id']}<br><b>Mode:</b> {self.capture_mode}")
         self.reset_state()
+        if self.camera is None:
+            source = SyntheticY16Source() if RADIOMETRIC_CAPTURE and SYNTHETIC_Y16 else None
+            self.camera = CameraManager(threaded=True, raw_y16=RADIOMETRIC_CAPTURE, source=source)
         self.timer.start(30)
 
     def reset_state(self):
         self.recording = False
+        if self.pipeline:
+            # Drop queued frames and wait out the one being analysed
+            self.pipeline.clear()
+            self.pipeline.drain()
         self.paused = False
         self.face_ready = False
         self.aligned_frames = 0
         self.frame_counter = 0
+        self.analyzer.reset()
+        self.scheduler.reset()
+        self.stimulus_label.setVisible(False)
+        self.detector.reset_tracking()
+        self.session_features = None
         self.start_btn.setEnabled(False)
         self.pause_btn.setEnabled(False)
         self.stop_btn.setEnabled(False)
         self.status_label.setText("● Idle")
         self.instruction_card.setText("Align your face for landmark detection")
+        self.logger.close()
+        self.metrics.stop_file()
+        self.metrics.reset()
         if self.video_writer:
-            self.video_writer.release()
+            self.analyzer.video_writer = None
+            self.video_writer.close()
             self.video_writer = None
 
     def update_frame(self):
-        ret, frame = self.camera.read() 
-        if not ret: return
-
-        thermal_frame = frame.copy() 
-
-        # 1. SPEAKING FACES LOGIC: Detect in RGB
-        landmarks = self.detector.get_landmarks(frame)
-
-        if landmarks is not None:
-            # 2. MAP TO THERMAL DOMAIN
-            thermal_landmarks = self.aligner.map_points(landmarks)
-
-            # 3. CYCLEGAN VALIDATION
-            fake_thermal = self.validator.generate_synthetic_thermal(frame)
-            validation_frame = self.validator.validate_alignment(fake_thermal, thermal_landmarks)
-            self.display_frame(validation_frame, self.validation_label)
-
-            # 4. DRAW FEEDBACK ON MAIN RGB
-            for (x, y) in landmarks:
-                cv2.circle(frame, (x, y), 2, (0, 255, 0), -1)
-
-            # 5. ALIGNMENT CHECK
-            nose_x, nose_y = landmarks[30]
-            cx, cy = frame.shape[1]//2, frame.shape[0]//2
+        with self.metrics.stage("capture"):
+            captured = self.camera.read_frame()
+        if captured is None: return
+        frame = captured.image
 
-            if abs(nose_x-cx) < 80 and abs(nose_y-cy) < 100:
-                self.aligned_frames += 1
-                self.instruction_card.setText("Hold steady...")
-            else:
-                self.aligned_frames = 0
-                self.instruction_card.setText("Center your face")
-
-            if self.aligned_frames >= self.required_stable_frames:
-                self.face_ready = True
-                self.instruction_card.setText("Face aligned ✓")
-                self.status_label.setText("● Ready")
-                if self.capture_mode == "VIDEO" and not self.recording:
-                    self.start_btn.setEnabled(True)
-
-            # 6. DATA LOGGING (Stimulus Points)
-            if self.recording and not self.paused:
-                self.frame_counter += 1
-                stim_data = self.processor.extract_stimulus_data(thermal_frame, thermal_landmarks)
-                self.logger.log_frame(self.frame_counter, thermal_landmarks, stim_data)
-                if self.video_writer: self.video_writer.write(frame)
+        record = self.recording and not self.paused
+        if self.recording:
+            self.show_stimulus()
+
+        if self.pipeline:
+            # Analysis happens on the worker; results come back via handle_result
+            self.pipeline.submit(frame, record, captured.frame_id, captured.timestamp)
+            return
+
+        result = self.analyzer.process(frame, record, captured.frame_id, captured.timestamp)
+        if result["validation_frame"] is not None:
+            self.display_frame(result["validation_frame"], self.validation_label)
+        self.handle_result(result)
+        if self.preview_due():
+            self.display_frame(result["frame"], self.camera_label)
+
+    def show_stimulus(self):
+        """Presents the stimulus block the scheduler says is running now."""
+        text = " + ".join(name.upper() for name in self.scheduler.current_blocks()) or "—"
+        if text != self.stimulus_label.text():
+            self.stimulus_label.setText(text)
+
+    def handle_result(self, result):
+        """Applies one analysed frame to the UI state (GUI thread only)."""
+        if self.pipeline:
+            if result["validation_image"] is not None:
+                self.validation_label.setPixmap(QPixmap.fromImage(result["validation_image"][0]))
+            if result["camera_image"] is not None:
+                self.camera_label.setPixmap(QPixmap.fromImage(result["camera_image"][0]))
+
+        if result["landmarks"] is None:
+            self.aligned_frames = 0
+            self.instruction_card.setText("Searching for features...")
+            return
 
+        if result["centered"]:
+            self.aligned_frames += 1
+            self.instruction_card.setText("Hold steady...")
         else:
             self.aligned_frames = 0
-            self.instruction_card.setText("Searching for features...")
+            self.instruction_card.setText("Center your face")
 
-        self.display_frame(frame, self.camera_label)
+        if self.aligned_frames >= self.required_stable_frames:
+            self.face_ready = True
+            self.instruction_card.setText("Face aligned ✓")
+            if not self.recording:
+                self.status_label.setText("● Ready")
+            if self.capture_mode == "VIDEO" and not self.recording:
+                self.start_btn.setEnabled(True)
+
+        if result["frame_index"] is not None:
+            self.frame_counter = result["frame_index"]
+
+    def prepare_display(self, result):
+        """
+        Worker-side: turns the analysed frames into label-sized QImages so the
+        GUI thread only has to wrap them in a QPixmap. The camera preview is
+        skipped when it is not due (PREVIEW_MAX_FPS).
+        """
+        result["camera_image"] = None
+        if self.preview_due():
+            result["camera_image"] = self.to_qimage(result["frame"], self.camera_label)
+        result["validation_image"] = None
+        if result["validation_frame"] is not None:
+            result["validation_image"] = self.to_qimage(result["validation_frame"], self.validation_label)
+        return result
+
+    def preview_due(self):
+        now = time.monotonic()
+        if now - self._last_preview < 1.0 / PREVIEW_MAX_FPS:
+            return False
+        self._last_preview = now
+        return True
+
+    def preview_size(self, label, w, h):
+        """Aspect-preserving fit of a w x h frame into the label, cached per size."""
+        key = (label.width(), label.height(), w, h)
+        size = self._preview_sizes.get(key)
+        if size is None:
+            scale = min(key[0] / w, key[1] / h)
+            size = self._preview_sizes[key] = (max(1, int(w * scale)), max(1, int(h * scale)))
+        return size
+
+    def to_qimage(self, frame, label):
+        """
+        Returns (QImage, buffer). The QImage wraps the BGR buffer directly
+        (no colour conversion); keep the buffer alive while the image is used.
+        """
+        h, w = frame.shape[:2]
+        tw, th = self.preview_size(label, w, h)
+        if (tw, th) != (w, h):
+            frame = cv2.resize(frame, (tw, th), interpolation=cv2.INTER_LINEAR)
+        frame = np.ascontiguousarray(frame)
+        img = QImage(frame.data, tw, th, frame.strides[0], QImage.Format.Format_BGR888)
+        return img, frame
 
     def display_frame(self, frame, label):
         if frame is None: return
-    
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        img = QImage(rgb.data, w, h, ch*w, QImage.Format.Format_RGB888)
-    
-        # Use .IgnoreAspectRatio to fill the fixed box, 
-        # or .KeepAspectRatio with a background color to stop growth
-        label.setPixmap(QPixmap.fromImage(img).scaled(
-            label.width(), 
-            label.height(), 
-            Qt.AspectRatioMode.KeepAspectRatio, 
-            Qt.TransformationMode.SmoothTransformation
-        ))
+        img, _buffer = self.to_qimage(frame, label)
+        label.setPixmap(QPixmap.fromImage(img))
+
+    def new_logger(self, user_id=None):
+        logger = DataLogger(async_mode=True, session_format="both", user_id=user_id)
+        logger.metrics = self.metrics
+        return logger
 
     def start_recording(self):
         if not self.face_ready: return
+        # Raw Y16 frames are only recorded as-is when clean frames are requested
+        frame_dtype = np.uint16 if RADIOMETRIC_CAPTURE and RECORD_CLEAN_FRAMES else np.uint8
+        if not can_record(RECORDING_MODE, frame_dtype):
+            self.status_label.setText(f"● Cannot record {np.dtype(frame_dtype)} frames as {RECORDING_MODE!r}; use 'ffv1' or 'raw'")
+            self.status_label.setStyleSheet("color:#ef4444;")
+            return
+        # Every recording is its own session: new files, frames counted from 1
+        if self.pipeline:
+            self.pipeline.drain()
+        self.logger.close()
+        self.logger = self.new_logger(self.user_data['id'])
+        self.analyzer.logger = self.logger
+        self.analyzer.reset()
         os.makedirs("data/videos", exist_ok=True)
-        filename = f"data/videos/{self.user_data['id']}_{int(time.time())}.avi"
-        self.video_writer = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*"XVID"), 20.0, (640, 480))
+        base_path = f"data/videos/{self.user_data['id']}_{int(time.time())}"
+        # Frame size is taken from the first recorded frame; encoding runs on its own thread
+        self.video_writer = VideoRecorder(base_path, fps=self.camera.frame_rate(), mode=RECORDING_MODE,
+                                          annotated=not RECORD_CLEAN_FRAMES)
+        self.analyzer.video_writer = self.video_writer
+        self.metrics.start_file(os.path.splitext(self.logger.file_path)[0] + "_metrics.jsonl", METRICS_FILE_INTERVAL)
+        # Block start/end markers (as frame numbers) are saved next to the session files
+        self.scheduler.start(output_paths=self.logger.session_paths())
+        self.stimulus_label.setVisible(True)
         self.recording = True
         self.start_btn.setEnabled(False)
         self.stop_btn.setEnabled(True)
@@ -234,7 +454,20 @@ class AlignmentPage(QWidget):
 
     def stop_recording(self):
         self.recording = False
-        if self.video_writer: self.video_writer.release()
+        # Let frames already submitted as recorded reach the logger and
+        # recorder before they are closed
+        if self.pipeline:
+            self.pipeline.drain()
+        self.analyzer.video_writer = None
+        if self.video_writer:
+            self.video_writer.close()
+            self.video_writer = None
+        self.logger.close()
+        self.scheduler.stop()
+        self.stimulus_label.setVisible(False)
+        self.metrics.stop_file()
+        # Feature vector is already complete; no second pass over the session file
+        self.session_features = self.analyzer.accumulator.features()
         self.status_label.setText("● Step 2 Complete: Data Saved")
         self.status_label.setStyleSheet("color:#22c55e;")
         self.stop_btn.setEnabled(False)